@@ -2,45 +2,50 @@ from dotenv import load_dotenv
 import os
 
 load_dotenv()
+import random
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, NamedTuple
+import rate_limit
+import token_manager
 
-BASE_URL = "https://openapi.koreainvestment.com:9443"
+BASE_URL = os.environ.get("KIS_BASE_URL", "https://openapi.koreainvestment.com:9443")
 ACCOUNT = os.environ["ACCOUNT"]
 APPKEY = os.environ["APPKEY"]
 APPSECRET = os.environ["APPSECRET"]
-ACCESS_TOKEN = os.environ["ACCESS_TOKEN"]
+ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN")  # 없으면 token_manager 가 발급/공유하는 토큰 사용
+# 각 함수의 token 인자로 요청마다 다른 토큰을 쓸 수 있음 (Flask 서버: 호출자 토큰)
 
-def fetch_current_price(code):
-    url = f"{BASE_URL}/uapi/domestic-stock/v1/quotations/inquire-price"
+# 요청 헤더/파라미터 생성 (async_api.py 와 공용)
+
+def resolve_token(token=None):
+    """token 을 주지 않으면 ACCESS_TOKEN, 없으면 token_manager 공유 토큰"""
+    return token or ACCESS_TOKEN or token_manager.get_token()
+
+def build_headers(tr_id, token, json_body=False):
     headers = {
-        "authorization": f"Bearer {ACCESS_TOKEN}",
+        "authorization": f"Bearer {token}",
         "appkey": APPKEY,
         "appsecret": APPSECRET,
-        "tr_id": "FHKST01010100"
+        "tr_id": tr_id,
     }
-    params = {
+    if json_body:
+        headers["content-type"] = "application/json; charset=utf-8"
+    return headers
+
+def price_params(code):
+    return {
         "FID_COND_MRKT_DIV_CODE": "J",
         "FID_INPUT_ISCD": code
     }
-    res = requests.get(url, headers=headers, params=params)
-    try:
-        data = res.json()
-        return int(data["output"]["stck_prpr"])
-    except Exception as e:
-        print(e)
-        return None
 
-def fetch_orders(account, code):
+def open_order_params(account, code):
     today = datetime.today().strftime('%Y%m%d')
-    url = f"{BASE_URL}/uapi/domestic-stock/v1/trading/inquire-daily-ccld"
-    headers = {
-        "authorization": f"Bearer {ACCESS_TOKEN}",
-        "appkey": APPKEY,
-        "appsecret": APPSECRET,
-        "tr_id": "TTTC0081R"
-    }
-    params = {
+    return {
         "CANO": account[:8],
         "ACNT_PRDT_CD": account[-2:],
         "INQR_STRT_DT": today,
@@ -57,24 +62,8 @@ def fetch_orders(account, code):
         "CTX_AREA_NK100": ""
     }
 
-    try:
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
-        return data["output1"]
-    except Exception as e:
-        print(e)
-        return []
-
-def cancel_order(account, order_no):
-    url = f"{BASE_URL}/uapi/domestic-stock/v1/trading/order-rvsecncl"
-    headers = {
-        "content-type": "application/json; charset=utf-8",
-        "authorization": f"Bearer {ACCESS_TOKEN}",
-        "appkey": APPKEY,
-        "appsecret": APPSECRET,
-        "tr_id": "TTTC0013U"
-    }
-    body = {
+def cancel_body(account, order_no):
+    return {
         "CANO": account[:8],
         "ACNT_PRDT_CD": account[-2:],
         "KRX_FWDG_ORD_ORGNO": "",
@@ -86,30 +75,8 @@ def cancel_order(account, order_no):
         "QTY_ALL_ORD_YN": "Y",  # 잔량 전부
     }
 
-    try:
-        res = requests.post(url, headers=headers, json=body)
-        data = res.json()
-        return data["rt_cd"] == "0"
-    except Exception as e:
-        print(e)
-        return False
-
-def clear_orders(account, code):
-    orders = fetch_orders(account, code)
-    for order in orders:
-        order_no = order["odno"]
-        result = cancel_order(account, order_no)
-        print(f"{order_no} 취소 성공" if result else f"{order_no} 취소 실패")
-
-def fetch_avail(account, code, target_price):
-    url = f"{BASE_URL}/uapi/domestic-stock/v1/trading/inquire-psbl-order"
-    headers = {
-        "authorization": f"Bearer {ACCESS_TOKEN}",
-        "appkey": APPKEY,
-        "appsecret": APPSECRET,
-        "tr_id": "TTTC8908R"
-    }
-    params = {
+def avail_params(account, code, target_price):
+    return {
         "CANO": account[:8],
         "ACNT_PRDT_CD": account[-2:],
         "PDNO": code,
@@ -118,26 +85,13 @@ def fetch_avail(account, code, target_price):
         "CMA_EVLU_AMT_ICLD_YN": "N",
         "OVRS_ICLD_YN": "N",
     }
-    try:
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
-        return data["output"]["nrcvb_buy_qty"]  # 미수 없는 매수 가능 수량
-    except Exception as e:
-        print(e)
-        return 0
 
-def fetch_quantity(account, code):
-    url = f"{BASE_URL}/uapi/domestic-stock/v1/trading/inquire-balance"
-    headers = {
-        "authorization": f"Bearer {ACCESS_TOKEN}",
-        "appkey": APPKEY,
-        "appsecret": APPSECRET,
-        "tr_id": "TTTC8434R"  # 주식 잔고 조회
-    }
-    params = {
+def balance_params(account):
+    return {
         "CANO": account[:8],
         "ACNT_PRDT_CD": account[-2:],
         "AFHR_FLPR_YN": "N",
+        "OFL_YN": "",  # 공란
         "INQR_DVSN": "02",  # 종목별
         "UNPR_DVSN": "01",  # 단가 구분 기본값
         "FUND_STTL_ICLD_YN": "N",
@@ -147,27 +101,10 @@ def fetch_quantity(account, code):
         "CTX_AREA_NK100": ""
     }
 
-    try:
-        res = requests.get(url, headers=headers, params=params)
-        data = res.json()
-        for item in data["output1"]:
-            if item["pdno"] == code:
-                return item["hldg_qty"]
-        return 0
-    except Exception as e:
-        print(e)
-        return 0
-
-def order(order_type, account, code, amount, target_price):
-    url = f"{BASE_URL}/uapi/domestic-stock/v1/trading/order-cash"
-    headers = {
-        "content-type": "application/json; charset=utf-8",
-        "authorization": f"Bearer {ACCESS_TOKEN}",
-        "appkey": APPKEY,
-        "appsecret": APPSECRET,
-        "tr_id": "TTTC0012U" if order_type == "BUY" else "TTTC0011U"  # 주식 현금 매수/매도 주문
-    }
-    body = {
+def order_request(order_type, account, code, amount, target_price):
+    """(tr_id, 본문) 주식 현금 매수/매도 주문"""
+    tr_id = "TTTC0012U" if order_type == "BUY" else "TTTC0011U"
+    return tr_id, {
         "CANO": account[:8],
         "ACNT_PRDT_CD": account[-2:],
         "PDNO": code,
@@ -176,42 +113,315 @@ def order(order_type, account, code, amount, target_price):
         "ORD_UNPR": str(target_price)
     }
 
+class KISClient:
+    """연결 풀을 공유하는 KIS REST 클라이언트
+
+    - keep-alive 세션 하나로 TCP/TLS 연결을 재사용
+    - 모든 요청에 (연결, 읽기) 타임아웃 적용
+    - tr_id 별 헤더를 미리 만들어 두고 토큰이 바뀔 때만 다시 생성
+    - 조회(GET)만 연결 오류/5xx 에 대해 지터를 준 지수 백오프로 재시도 (주문은 중복 위험이 있어 재시도 안 함)
+    - 모든 요청은 보내기 전에 속도 제한 스케줄러에서 토큰을 받음 (주문/취소 우선)
+    """
+
+    RETRY_STATUS = (500, 502, 503, 504)
+
+    def __init__(self, base_url=None, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 retries=2, backoff=0.2, limiter=None):
+        self.base_url = base_url or BASE_URL
+        self.limiter = limiter or rate_limit.limiter
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.headers_cache = {}  # (tr_id, 본문 여부) -> (토큰, 헤더)
+        self.lock = threading.Lock()
+
+    def headers(self, tr_id, json_body=False, token=None):
+        """tr_id 헤더 템플릿 (token 을 주지 않으면 ACCESS_TOKEN, 없으면 공유 토큰 사용)"""
+        token = resolve_token(token)
+        key = (tr_id, json_body)
+        cached = self.headers_cache.get(key)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+        headers = build_headers(tr_id, token, json_body)
+        with self.lock:
+            self.headers_cache[key] = (token, headers)
+        return headers
+
+    def get(self, path, tr_id, params, tr_cont="", token=None):
+        """조회 요청 (연결 오류, 타임아웃, 5xx 는 재시도, tr_cont="N" 은 연속 조회)"""
+        url = self.base_url + path
+        headers = self.headers(tr_id, token=token)
+        if tr_cont:
+            headers = dict(headers, tr_cont=tr_cont)
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire(tr_id)
+            try:
+                res = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+                if res.status_code not in self.RETRY_STATUS or attempt == self.retries:
+                    return res
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def post(self, path, tr_id, body, token=None):
+        """주문/취소 요청 (재시도 없음)"""
+        self.limiter.acquire(tr_id)
+        return self.session.post(self.base_url + path, headers=self.headers(tr_id, json_body=True, token=token),
+                                 json=body, timeout=self.timeout)
+
+    def prewarm(self, connections=None):
+        """장 시작 전에 연결 풀을 미리 채워 첫 주문의 TCP/TLS 핸드셰이크 제거"""
+        connections = connections or min(self.pool_size, 4)
+
+        def touch(_):
+            try:
+                self.session.head(self.base_url, timeout=self.timeout)
+                return True
+            except requests.RequestException:
+                return False
+
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            return sum(pool.map(touch, range(connections)))
+
+# 프로세스 공용 클라이언트
+client = KISClient()
+
+def prewarm(connections=None):
+    return client.prewarm(connections)
+
+def fetch_current_price(code, token=None):
     try:
-        res = requests.post(url, headers=headers, json=body)
+        res = client.get("/uapi/domestic-stock/v1/quotations/inquire-price", "FHKST01010100", price_params(code),
+                         token=token)
+        data = res.json()
+        return int(data["output"]["stck_prpr"])
+    except Exception as e:
+        print(e)
+        return None
+
+def fetch_orders(account, code, token=None):
+    params = open_order_params(account, code)
+    try:
+        return _open_order_rows(params, token)
+    except Exception as e:
+        print(e)
+        return []
+
+def _open_order_rows(params, token=None):
+    return [row for data in iter_daily_ccld(params, token) for row in data["output1"]]
+
+def next_page_params(tr_id, params, data, tr_cont):
+    """연속 조회 다음 페이지 파라미터 (응답 헤더 tr_cont 가 F/M 이 아니면 마지막 페이지라 None)
+
+    응답이 오류면 RuntimeError (async_api 도 같은 규칙으로 페이지를 넘김)
+    """
+    if data.get("rt_cd") not in (None, "0"):
+        raise RuntimeError(f"{tr_id} 조회 실패: {data.get('msg1')}")
+    if tr_cont not in ("F", "M"):
+        return None
+    return dict(params, CTX_AREA_FK100=data.get("ctx_area_fk100", ""),
+                CTX_AREA_NK100=data.get("ctx_area_nk100", ""))
+
+def _pages(path, tr_id, params, token=None, max_pages=1000):
+    """연속 조회 (응답 헤더 tr_cont 가 F/M 이면 ctx_area_fk100/nk100 으로 다음 페이지 요청)"""
+    tr_cont = ""
+    for _ in range(max_pages):
+        res = client.get(path, tr_id, params, tr_cont, token=token)
+        data = res.json()
+        next_params = next_page_params(tr_id, params, data, res.headers.get("tr_cont"))
+        yield data
+        if next_params is None:
+            return
+        params = next_params
+        tr_cont = "N"
+
+def iter_daily_ccld(params, token=None):
+    """주식일별주문체결조회 페이지 단위 제너레이터"""
+    return _pages("/uapi/domestic-stock/v1/trading/inquire-daily-ccld", "TTTC0081R", params, token)
+
+def cancel_order(account, order_no, token=None):
+    try:
+        res = client.post("/uapi/domestic-stock/v1/trading/order-rvsecncl", "TTTC0013U",
+                          cancel_body(account, order_no), token=token)
         data = res.json()
         return data["rt_cd"] == "0"
     except Exception as e:
         print(e)
         return False
+    finally:
+        invalidate_balance(account)
 
-def fetch_eval(account):
-    url = f"{BASE_URL}/uapi/domestic-stock/v1/trading/inquire-balance"
-    headers = {
-        "authorization": f"Bearer {ACCESS_TOKEN}",
-        "appkey": APPKEY,
-        "appsecret": APPSECRET,
-        "tr_id": "TTTC8434R"  # 주식 잔고 조회
-    }
-    params = {
-        "CANO": account[:8],
-        "ACNT_PRDT_CD": account[-2:],
-        "AFHR_FLPR_YN": "N",
-        "OFL_YN": "",  # 공란
-        "INQR_DVSN": "02",  # 종목별
-        "UNPR_DVSN": "01",  # 단가 구분 기본값
-        "FUND_STTL_ICLD_YN": "N",
-        "FNCG_AMT_AUTO_RDPT_YN": "N",
-        "PRCS_DVSN": "00",  # 전일 매매 포함
-        "CTX_AREA_FK100": "",
-        "CTX_AREA_NK100": ""
-    }
+# 이 프로세스가 아는 미체결 가능 주문: (계좌, 종목) -> 주문번호 집합
+# 키가 없으면 알 수 없는 상태(재시작 직후, 다른 프로세스의 주문 등)라서 미체결 조회가 필요함
+_open_orders = {}
+_open_orders_lock = threading.Lock()
+
+def _remember_order(account, code, order_no):
+    with _open_orders_lock:
+        known = _open_orders.get((account, code))
+        if order_no is None:
+            _open_orders.pop((account, code), None)  # 주문번호를 모르면 다음 정리 때 조회
+        elif known is not None:
+            known.add(order_no)
+
+def clear_orders(account, code, force=False, token=None):
+    """미체결 주문 일괄 취소
+
+    취소 요청은 연결 풀 크기만큼 동시에 보내고 (속도 제한 스케줄러가 초당 건수를 맞춤)
+    {"queried": 미체결 조회 여부, "cancelled": [주문번호], "failed": [주문번호], "error": 조회 오류} 를 반환.
+    마지막 정리 이후 이 프로세스에서 낸 주문이 없으면 미체결 조회를 건너뜀 (force=True 면 항상 조회).
+    """
+    key = (account, code)
+    with _open_orders_lock:
+        # _remember_order 가 원본 집합을 고치므로 복사해 두어야 정리 중에 낸 주문을 구분할 수 있음
+        known = set(_open_orders[key]) if key in _open_orders else None
+    result = {"queried": False, "cancelled": [], "failed": [], "error": None}
+    if known is not None and not known and not force:
+        return result
 
     try:
-        res = requests.get(url, headers=headers, params=params)
+        orders = _open_order_rows(open_order_params(account, code), token)
+    except Exception as e:
+        # 조회 실패시 상태를 모르는 것으로 두고 다음 사이클에 다시 조회
+        print(e)
+        with _open_orders_lock:
+            _open_orders.pop(key, None)
+        result["error"] = str(e)
+        return result
+    result["queried"] = True
+
+    order_numbers = [order["odno"] for order in orders]
+    if order_numbers:
+        with ThreadPoolExecutor(max_workers=min(len(order_numbers), client.pool_size)) as pool:
+            outcomes = list(pool.map(lambda order_no: cancel_order(account, order_no, token), order_numbers))
+        for order_no, success in zip(order_numbers, outcomes):
+            result["cancelled" if success else "failed"].append(order_no)
+            print(f"{order_no} 취소 성공" if success else f"{order_no} 취소 실패")
+
+    with _open_orders_lock:
+        # 정리하는 동안 다른 스레드가 낸 주문은 남겨둠
+        current = _open_orders.get(key)
+        placed = current - known if current is not None and known is not None else set()
+        _open_orders[key] = set(result["failed"]) | placed
+    return result
+
+def fetch_avail(account, code, target_price, token=None):
+    try:
+        res = client.get("/uapi/domestic-stock/v1/trading/inquire-psbl-order", "TTTC8908R",
+                         avail_params(account, code, target_price), token=token)
         data = res.json()
-        print(data)
-        return data["output2"][0]["tot_evlu_amt"]
+        return int(data["output"]["nrcvb_buy_qty"])  # 미수 없는 매수 가능 수량
     except Exception as e:
         print(e)
-        return None
+        return 0
+
+class Holding(NamedTuple):
+    code: str
+    name: str
+    quantity: int            # 보유 수량
+    orderable_quantity: int  # 주문 가능 수량
+    avg_price: float         # 매입 평균가
+    current_price: int
+    eval_amount: int         # 평가 금액
+    profit: int              # 평가 손익
+
+class BalanceSnapshot(NamedTuple):
+    holdings: Dict[str, Holding]
+    cash: int        # 예수금 총금액
+    total_eval: int  # 총 평가 금액
+    fetched_at: float
+
+    def quantity(self, code: str) -> int:
+        holding = self.holdings.get(code)
+        return holding.quantity if holding else 0
+
+# 잔고 스냅샷 유효 시간 (초), 주문/취소 후에는 즉시 무효화
+BALANCE_TTL = 2.0
+_balances = {}  # (계좌, 토큰) -> BalanceSnapshot (다른 토큰으로 받은 잔고는 내주지 않음)
+_balance_lock = threading.Lock()
+
+def _balance_pages(account, token=None):
+    """inquire-balance 연속 조회 (CTX_AREA_FK100/NK100, tr_cont)"""
+    return _pages("/uapi/domestic-stock/v1/trading/inquire-balance", "TTTC8434R",
+                  balance_params(account), token)  # 주식 잔고 조회
+
+def parse_balance(pages):
+    """inquire-balance 응답 페이지들 -> BalanceSnapshot (수량/금액은 int)"""
+    holdings = {}
+    summary = {}
+    for data in pages:
+        for item in data["output1"]:
+            quantity = int(item["hldg_qty"])
+            if quantity <= 0:
+                continue
+            holdings[item["pdno"]] = Holding(
+                code=item["pdno"],
+                name=item.get("prdt_name", ""),
+                quantity=quantity,
+                orderable_quantity=int(item.get("ord_psbl_qty") or 0),
+                avg_price=float(item.get("pchs_avg_pric") or 0),
+                current_price=int(item.get("prpr") or 0),
+                eval_amount=int(item.get("evlu_amt") or 0),
+                profit=int(item.get("evlu_pfls_amt") or 0),
+            )
+        if data.get("output2"):
+            summary = data["output2"][0]
+    return BalanceSnapshot(
+        holdings=holdings,
+        cash=int(summary.get("dnca_tot_amt") or 0),
+        total_eval=int(summary["tot_evlu_amt"]),
+        fetched_at=time.time(),
+    )
+
+def fetch_balance(account, max_age=BALANCE_TTL, token=None):
+    """계좌 잔고 스냅샷 (max_age 초 이내에 조회한 스냅샷이 있으면 재사용, 실패시 None)"""
+    key = (account, token)
+    with _balance_lock:
+        snapshot = _balances.get(key)
+        if snapshot is not None and time.time() - snapshot.fetched_at < max_age:
+            return snapshot
+        try:
+            snapshot = parse_balance(_balance_pages(account, token))
+        except Exception as e:
+            print(e)
+            return None
+        _balances[key] = snapshot
+        return snapshot
+
+def invalidate_balance(account=None):
+    """주문/취소 후 다음 조회에서 잔고를 새로 받도록 스냅샷 삭제"""
+    with _balance_lock:
+        if account is None:
+            _balances.clear()
+        else:
+            for key in [key for key in _balances if key[0] == account]:
+                del _balances[key]
+
+def fetch_quantity(account, code, token=None):
+    snapshot = fetch_balance(account, token=token)
+    return snapshot.quantity(code) if snapshot else 0
+
+def order(order_type, account, code, amount, target_price, token=None):
+    tr_id, body = order_request(order_type, account, code, amount, target_price)
+    try:
+        res = client.post("/uapi/domestic-stock/v1/trading/order-cash", tr_id, body, token=token)
+        data = res.json()
+        if data["rt_cd"] != "0":
+            return False
+        _remember_order(account, code, (data.get("output") or {}).get("ODNO"))
+        return True
+    except Exception as e:
+        print(e)
+        return False
+    finally:
+        invalidate_balance(account)
 
+def fetch_eval(account, token=None):
+    snapshot = fetch_balance(account, token=token)
+    return snapshot.total_eval if snapshot else None
@@ -0,0 +1,204 @@
+# async_api.py
+"""
+api.py 의 비동기 버전 (httpx.AsyncClient)
+
+연결을 재사용하는 클라이언트 하나로 여러 종목 시세/계좌 조회를 동시에 보냅니다.
+h2 패키지가 설치되어 있으면 HTTP/2 로 연결 하나에 요청을 다중화합니다.
+
+    async with AsyncKISClient() as client:
+        prices = await client.fetch_current_prices(["122640", "005930"])
+
+동기 코드(Flask 서버, 자동매매 루프)에서는 current_prices(codes) 를 사용합니다.
+백그라운드 스레드의 이벤트 루프 하나에서 같은 클라이언트(연결 풀)를 계속 재사용합니다.
+요청 헤더/파라미터는 api.py 의 것을 그대로 씁니다.
+"""
+
+import asyncio
+import threading
+
+import httpx
+
+import api
+import rate_limit
+
+BASE_URL = api.BASE_URL
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+class AsyncKISClient:
+    def __init__(self, base_url=None, token=None, max_concurrency=10, connect_timeout=3.05,
+                 read_timeout=10, http2=None, limiter=None):
+        self.token = token
+        self.limiter = limiter or rate_limit.limiter
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = httpx.AsyncClient(
+            base_url=base_url or BASE_URL,
+            http2=HTTP2 if http2 is None else http2,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        self.headers_cache = {}  # (tr_id, 본문 여부) -> (토큰, 헤더)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def headers(self, tr_id, json_body=False, token=None):
+        """tr_id 헤더 템플릿 (token -> 클라이언트 토큰 -> ACCESS_TOKEN -> 공유 토큰 순서)"""
+        token = api.resolve_token(token or self.token)
+        key = (tr_id, json_body)
+        cached = self.headers_cache.get(key)
+        if cached is not None and cached[0] == token:
+            return cached[1]
+        headers = api.build_headers(tr_id, token, json_body)
+        self.headers_cache[key] = (token, headers)
+        return headers
+
+    async def get(self, path, tr_id, params, token=None):
+        data, _ = await self.get_page(path, tr_id, params, token=token)
+        return data
+
+    async def get_page(self, path, tr_id, params, tr_cont="", token=None):
+        """(응답 본문, 응답 헤더 tr_cont) - tr_cont="N" 은 연속 조회"""
+        headers = self.headers(tr_id, token=token)
+        if tr_cont:
+            headers = dict(headers, tr_cont=tr_cont)
+        async with self.semaphore:
+            await self.limiter.acquire_async(tr_id)
+            res = await self.client.get(path, headers=headers, params=params)
+        return res.json(), res.headers.get("tr_cont")
+
+    async def pages(self, path, tr_id, params, token=None, max_pages=1000):
+        """연속 조회한 응답 본문 목록 (api._pages 와 같은 규칙으로 CTX_AREA_FK100/NK100 을 넘김)"""
+        results = []
+        tr_cont = ""
+        for _ in range(max_pages):
+            data, next_cont = await self.get_page(path, tr_id, params, tr_cont, token=token)
+            results.append(data)
+            params = api.next_page_params(tr_id, params, data, next_cont)
+            if params is None:
+                break
+            tr_cont = "N"
+        return results
+
+    async def post(self, path, tr_id, body, token=None):
+        async with self.semaphore:
+            await self.limiter.acquire_async(tr_id)
+            res = await self.client.post(path, headers=self.headers(tr_id, json_body=True, token=token), json=body)
+        return res.json()
+
+    async def fetch_current_price(self, code, token=None):
+        try:
+            data = await self.get("/uapi/domestic-stock/v1/quotations/inquire-price", "FHKST01010100",
+                                  api.price_params(code), token=token)
+            return int(data["output"]["stck_prpr"])
+        except Exception as e:
+            print(e)
+            return None
+
+    async def fetch_current_prices(self, codes, token=None):
+        """여러 종목 현재가를 동시에 조회 (종목코드 -> 가격, 실패한 종목은 None)"""
+        prices = await asyncio.gather(*(self.fetch_current_price(code, token) for code in codes))
+        return dict(zip(codes, prices))
+
+    async def fetch_orders(self, account, code, token=None):
+        try:
+            pages = await self.pages("/uapi/domestic-stock/v1/trading/inquire-daily-ccld", "TTTC0081R",
+                                     api.open_order_params(account, code), token=token)
+            return [row for data in pages for row in data["output1"]]
+        except Exception as e:
+            print(e)
+            return []
+
+    async def cancel_order(self, account, order_no, token=None):
+        try:
+            data = await self.post("/uapi/domestic-stock/v1/trading/order-rvsecncl", "TTTC0013U",
+                                   api.cancel_body(account, order_no), token=token)
+            return data["rt_cd"] == "0"
+        except Exception as e:
+            print(e)
+            return False
+        finally:
+            api.invalidate_balance(account)
+
+    async def clear_orders(self, account, code, token=None):
+        """미체결 주문을 동시에 취소하고 주문번호 -> 성공 여부 반환"""
+        order_numbers = [order["odno"] for order in await self.fetch_orders(account, code, token)]
+        results = await asyncio.gather(*(self.cancel_order(account, order_no, token) for order_no in order_numbers))
+        for order_no, result in zip(order_numbers, results):
+            print(f"{order_no} 취소 성공" if result else f"{order_no} 취소 실패")
+        return dict(zip(order_numbers, results))
+
+    async def fetch_avail(self, account, code, target_price, token=None):
+        try:
+            data = await self.get("/uapi/domestic-stock/v1/trading/inquire-psbl-order", "TTTC8908R",
+                                  api.avail_params(account, code, target_price), token=token)
+            return int(data["output"]["nrcvb_buy_qty"])  # 미수 없는 매수 가능 수량
+        except Exception as e:
+            print(e)
+            return 0
+
+    async def fetch_balance(self, account, token=None):
+        """계좌 잔고 스냅샷 (api.BalanceSnapshot, 실패시 None)"""
+        try:
+            pages = await self.pages("/uapi/domestic-stock/v1/trading/inquire-balance", "TTTC8434R",
+                                     api.balance_params(account), token=token)  # 주식 잔고 조회
+            return api.parse_balance(pages)
+        except Exception as e:
+            print(e)
+            return None
+
+    async def fetch_quantity(self, account, code, token=None):
+        snapshot = await self.fetch_balance(account, token)
+        return snapshot.quantity(code) if snapshot else 0
+
+    async def fetch_eval(self, account, token=None):
+        snapshot = await self.fetch_balance(account, token)
+        return snapshot.total_eval if snapshot else None
+
+    async def order(self, order_type, account, code, amount, target_price, token=None):
+        tr_id, body = api.order_request(order_type, account, code, amount, target_price)
+        try:
+            data = await self.post("/uapi/domestic-stock/v1/trading/order-cash", tr_id, body, token=token)
+            return data["rt_cd"] == "0"
+        except Exception as e:
+            print(e)
+            return False
+        finally:
+            api.invalidate_balance(account)
+
+
+# 동기 코드용 공용 클라이언트 (백그라운드 이벤트 루프에서 프로세스가 끝날 때까지 유지)
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_client():
+    """(클라이언트, 이벤트 루프) - 처음 호출할 때 루프 스레드와 클라이언트를 만듦"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="kis-async-client", daemon=True).start()
+
+            async def create():
+                return AsyncKISClient()  # 세마포어/연결 풀이 이 루프에 묶이도록 루프 안에서 생성
+            _shared = (asyncio.run_coroutine_threadsafe(create(), loop).result(), loop)
+        return _shared
+
+
+def current_prices(codes, token=None, timeout=30):
+    """동기 코드용: 여러 종목 현재가를 한 번에 조회 (종목코드 -> 가격)"""
+    client, loop = shared_client()
+    future = asyncio.run_coroutine_threadsafe(client.fetch_current_prices(codes, token=token), loop)
+    return future.result(timeout)
@@ -1,49 +1,83 @@
-import json
-import matplotlib.pyplot as plt
+import argparse
+import numpy as np
+import bar_cache
 import indicator
 import strategy
 
 def load_prices(filename):
-    result = []
-    with open(filename, "r") as f:
-        data = json.load(f)
-    for item in data:
-        current_price = int(item["stck_prpr"])
-        result.append(current_price)
-    return result
-
-def show_graph(prices, ma20, ma60, interests):
-    _, ax1 = plt.subplots()
-    ax1.plot(range(len(prices)), prices, label="가격", color="black")
-    ax1.plot(range(len(ma20)), ma20, label="MA20", color="orange")
-    ax1.plot(range(len(ma60)), ma60, label="MA60", color="yellow")
-    for i in range(len(prices)):
-        y = prices[i]
-        signal = strategy.ma_signal(ma20[:i + 1], ma60[:i + 1])
-        if signal == "BUY":
-            ax1.plot(i, y, "ro")  # 빨간 점: 매수
-        elif signal == "SELL":
-            ax1.plot(i, y, "go")  # 초록 점: 매도
+    # 컬럼 캐시에서 메모리 매핑으로 읽기 (원본이 바뀌면 캐시 자동 갱신)
+    return bar_cache.load_bars(filename)["stck_prpr"]
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 다운샘플링: 모양을 유지하며 남길 점의 인덱스 반환"""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        # 다음 버킷 평균점과 직전 선택점이 만드는 삼각형 넓이가 가장 큰 점 선택
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def _downsampled(values, max_points):
+    # 값이 없는 구간(이동평균 초기 구간)은 제외하고 다운샘플링
+    y = np.asarray(values, dtype=float)
+    x = np.flatnonzero(~np.isnan(y))
+    keep = lttb(x, y[x], max_points)
+    return x[keep], y[x[keep]]
+
+def show_graph(prices, ma20, ma60, interests, output=None, max_points=2000):
+    # output 이 주어지면 화면 없이 파일(PNG/SVG 등)로 저장
+    import matplotlib
+    if output:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax1 = plt.subplots()
+    ax1.plot(*_downsampled(prices, max_points), label="가격", color="black")
+    ax1.plot(*_downsampled(ma20, max_points), label="MA20", color="orange")
+    ax1.plot(*_downsampled(ma60, max_points), label="MA60", color="yellow")
+
+    # 매수(빨간 점), 매도(초록 점)를 한 번에 그리기
+    signal_index, signals = strategy.ma_signal_series(ma20, ma60)
+    ax1.scatter(signal_index, np.asarray(prices)[signal_index],
+                c=np.where(signals == "BUY", "red", "green"), zorder=3)
 
     ax1.legend(loc="upper left")
 
     ax2 = ax1.twinx()
-    ax2.plot(range(len(interests)), interests, label="수익률", color="blue")
+    ax2.plot(*_downsampled(interests, max_points), label="수익률", color="blue")
     ax2.legend(loc="upper right")
     plt.title("백테스트 결과")
-    plt.show()
+    if output:
+        fig.savefig(output)
+        plt.close(fig)
+    else:
+        plt.show()
 
-def backtest(prices, initial_balance):
+def backtest(prices, initial_balance, show=True, output=None):
     balance = initial_balance
     quantity = 0
     ma20 = []
     ma60 = []
     interests = []
+    ma_strategy = strategy.MACrossStrategy(20, 60)
 
     for i in range(len(prices)):
-        ma20.append(indicator.ma(prices[:i + 1], 20))
-        ma60.append(indicator.ma(prices[:i + 1], 60))
-        signal = strategy.ma_signal(ma20, ma60)
+        signal = ma_strategy.on_bar(prices[i])
+        ma20.append(ma_strategy.short.value)
+        ma60.append(ma_strategy.long.value)
 
         if signal == "BUY":
             amount = balance // prices[i]
@@ -59,8 +93,64 @@ def backtest(prices, initial_balance):
         if signal is not None:
             print(f"시그널: {signal} 수익률: {roi:.2f}%")
 
-    show_graph(prices, ma20, ma60, interests)
+    if show or output:
+        show_graph(prices, ma20, ma60, interests, output)
+    return interests
+
+def backtest_vectorized(prices, initial_balance, short_window=20, long_window=60, prefix=None):
+    """backtest와 같은 결과를 배열 연산으로 계산하는 벡터화 엔진"""
+    prices = np.asarray(prices)
+    if prefix is None:
+        prefix = indicator.prefix_sum(prices)
+    ma_short = indicator.ma_array(prices, short_window, prefix)
+    ma_long = indicator.ma_array(prices, long_window, prefix)
+    return simulate_crossover(prices, ma_short, ma_long, initial_balance)
+
+def simulate_crossover(prices, ma_short, ma_long, initial_balance):
+    """이동평균 배열로 골든/데드 크로스를 찾고 현금, 수량, 수익률 시계열 계산"""
+    prices = np.asarray(prices)
+    signal_index, signals = strategy.ma_signal_series(ma_short, ma_long)
+    is_buy = signals == "BUY"
+
+    # 잔고는 이전 체결 결과에 의존하므로 신호 지점만 순서대로 처리
+    balance = initial_balance
+    quantity = 0
+    cash_states = [balance]
+    quantity_states = [quantity]
+    for i, buy_signal in zip(signal_index.tolist(), is_buy.tolist()):
+        price = prices[i].item()
+        if buy_signal:
+            amount = balance // price
+            quantity += amount
+            balance -= amount * price
+        else:
+            balance += quantity * price
+            quantity = 0
+        cash_states.append(balance)
+        quantity_states.append(quantity)
+
+    # 각 시점의 직전 신호 상태를 앞으로 채우기
+    state = np.searchsorted(signal_index, np.arange(len(prices)), side="right")
+    cash = np.asarray(cash_states)[state]
+    quantity = np.asarray(quantity_states)[state]
+    interests = ((cash + prices * quantity) / initial_balance - 1) * 100
+
+    return {
+        "ma_short": ma_short,
+        "ma_long": ma_long,
+        "signal_index": signal_index,
+        "signal": signals,
+        "cash": cash,
+        "quantity": quantity,
+        "interests": interests,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="이동평균 크로스 백테스트")
+    parser.add_argument("file", nargs="?", default="sample.json", help="분봉 JSON 파일")
+    parser.add_argument("--output", help="그래프를 창 대신 파일로 저장 (예: result.png, result.svg)")
+    args = parser.parse_args()
 
-# 실행
-sample_prices = load_prices("sample.json")
-backtest(sample_prices, 1000 * 10000)
\ No newline at end of file
+    # 실행
+    sample_prices = load_prices(args.file)
+    backtest(sample_prices, 1000 * 10000, output=args.output)
\ No newline at end of file
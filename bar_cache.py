@@ -0,0 +1,156 @@
+# bar_cache.py
+"""
+분봉 JSON 컬럼 캐시
+
+분봉 JSON 을 한 번 읽어 필드별 타입 배열(.npy)로 원본 옆 디렉터리(<원본>.bars/)에 저장하고,
+이후에는 메모리 매핑으로 복사 없이 불러옵니다. 원본 파일의 크기나 수정 시각이 바뀌면
+캐시를 자동으로 다시 만듭니다.
+
+  python bar_cache.py sample.json        캐시 생성/갱신
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+# 필드 -> (array typecode, numpy dtype)
+COLUMNS = {
+    "stck_bsop_date": ("i", np.int32),  # 영업일자 YYYYMMDD
+    "stck_cntg_hour": ("i", np.int32),  # 체결시간 HHMMSS
+    "stck_prpr": ("q", np.int64),       # 현재가(종가)
+    "stck_oprc": ("q", np.int64),       # 시가
+    "stck_hgpr": ("q", np.int64),       # 고가
+    "stck_lwpr": ("q", np.int64),       # 저가
+    "cntg_vol": ("q", np.int64),        # 체결 거래량
+    "acml_tr_pbmn": ("q", np.int64),    # 누적 거래대금
+}
+
+
+def cache_dir(filename):
+    return filename + ".bars"
+
+
+def iter_records(filename, chunk_size=1 << 20):
+    """JSON 배열의 객체를 파일 전체를 메모리에 올리지 않고 하나씩 반환"""
+    decoder = json.JSONDecoder()
+    with open(filename, "r", encoding="utf-8") as f:
+        buffer = ""
+        started = False
+        eof = False
+        while not eof:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            pos = 0
+            length = len(buffer)
+            while True:
+                while pos < length and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= length:
+                    break
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{filename}: JSON 배열이 아닙니다")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                try:
+                    record, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break  # 객체가 청크 경계에 걸림, 다음 청크와 합쳐서 다시 시도
+                yield record
+            buffer = buffer[pos:]
+        if started:
+            raise ValueError(f"{filename}: JSON 배열이 끝나지 않았습니다")
+
+
+def _source_stamp(filename):
+    stat = os.stat(filename)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_fresh(filename):
+    meta_path = os.path.join(cache_dir(filename), "meta.json")
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get("version") == CACHE_VERSION and meta.get("source") == _source_stamp(filename)
+
+
+def build(filename):
+    """JSON 을 스트리밍으로 파싱해 컬럼 캐시 생성 (고유한 임시 디렉터리에 쓴 뒤 os.replace 로 교체)
+
+    여러 프로세스가 동시에 만들면 먼저 자리를 차지한 캐시를 그대로 쓰고 나머지는 버림
+    """
+    stamp = _source_stamp(filename)
+    columns = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+    appenders = [(name, columns[name].append) for name in COLUMNS]
+    rows = 0
+    for record in iter_records(filename):
+        for name, append in appenders:
+            append(int(record.get(name) or 0))
+        rows += 1
+
+    target = cache_dir(filename)
+    temp = tempfile.mkdtemp(prefix=os.path.basename(target) + ".tmp", dir=os.path.dirname(os.path.abspath(target)))
+    for name, (_, dtype) in COLUMNS.items():
+        np.save(os.path.join(temp, name + ".npy"), np.frombuffer(columns[name], dtype=dtype))
+    with open(os.path.join(temp, "meta.json"), "w") as f:
+        json.dump({"version": CACHE_VERSION, "source": stamp, "rows": rows}, f)
+
+    try:
+        os.replace(temp, target)  # 캐시가 없으면 그대로 자리를 차지
+        return rows
+    except OSError:
+        pass  # 디렉터리는 비어 있지 않은 디렉터리 위로 교체할 수 없음
+
+    if is_fresh(filename):
+        shutil.rmtree(temp, ignore_errors=True)  # 같은 원본으로 다른 프로세스가 먼저 만듦
+        return rows
+    # 오래된 캐시는 옆으로 치운 뒤 교체 (그 사이 다른 프로세스가 먼저 넣었으면 그쪽을 씀)
+    old = temp + ".old"
+    try:
+        os.replace(target, old)
+    except FileNotFoundError:
+        pass
+    try:
+        os.replace(temp, target)
+    except OSError:
+        shutil.rmtree(temp, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    return rows
+
+
+def load_bars(filename):
+    """필드 이름 -> 메모리 매핑된 읽기 전용 배열 (캐시가 없거나 오래되면 먼저 생성)"""
+    directory = cache_dir(filename)
+    for attempt in range(3):
+        if not is_fresh(filename):
+            build(filename)
+        try:
+            return {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in COLUMNS}
+        except FileNotFoundError:
+            # 다른 프로세스가 오래된 캐시를 교체하는 중이면 다시 확인
+            if attempt == 2:
+                raise
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        if is_fresh(path):
+            print(f"✅ {path}: 캐시 최신")
+        else:
+            print(f"🔨 {path}: 캐시 생성 ({build(path):,}개 분봉)")
@@ -0,0 +1,215 @@
+# bench.py
+"""
+지표, 신호, 백테스트 성능 벤치마크 (합성 분봉 시계열)
+
+  python bench.py                                  기본 크기 10k, 100k, 1M
+  python bench.py --sizes 10000,1000000,10000000 --output bench_results.json
+  python bench.py --compare old_results.json       이전 결과와 처리량 비교
+
+결과는 커밋 해시와 함께 JSON 으로 저장되어 커밋 사이의 성능 회귀를 비교할 수 있습니다.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import math
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import backtest
+import indicator
+import strategy
+import synthetic
+
+INITIAL_BALANCE = 1000 * 10000
+
+
+def bench_ma_slices(prices):
+    # 기존 backtest 방식: 매 봉마다 전체 히스토리를 잘라서 계산 (O(n^2))
+    for i in range(len(prices)):
+        indicator.ma(prices[:i + 1], 20)
+
+
+def bench_moving_average(prices):
+    ma20 = indicator.MovingAverage(20)
+    for price in prices:
+        ma20.update(price)
+
+
+def bench_ma_array(prices):
+    indicator.ma_array(prices, 20)
+
+
+def bench_ma_signal(prices, ma20, ma60):
+    # 실시간 루프 방식: 늘어나는 리스트에 매 봉마다 신호 확인
+    short, long = [], []
+    for i in range(len(prices)):
+        short.append(ma20[i])
+        long.append(ma60[i])
+        strategy.ma_signal(short, long)
+
+
+def bench_ma_signal_series(prices, ma20, ma60):
+    strategy.ma_signal_series(ma20, ma60)
+
+
+def bench_backtest(prices):
+    with contextlib.redirect_stdout(io.StringIO()):
+        backtest.backtest(prices, INITIAL_BALANCE, show=False)
+
+
+def bench_backtest_vectorized(prices):
+    backtest.backtest_vectorized(prices, INITIAL_BALANCE)
+
+
+# (이름, 함수, 입력 준비, 최대 크기 옵션)
+CASES = [
+    ("indicator.ma (history slices)", bench_ma_slices, "list", "naive_limit"),
+    ("MovingAverage.update", bench_moving_average, "list", "loop_limit"),
+    ("indicator.ma_array", bench_ma_array, "array", None),
+    ("strategy.ma_signal", bench_ma_signal, "list_ma", "loop_limit"),
+    ("strategy.ma_signal_series", bench_ma_signal_series, "array_ma", None),
+    ("backtest.backtest", bench_backtest, "list", "loop_limit"),
+    ("backtest.backtest_vectorized", bench_backtest_vectorized, "array", None),
+]
+
+
+def prepare(kind, prices):
+    if kind == "list":
+        return (prices.tolist(),)
+    if kind == "array":
+        return (prices,)
+    ma20 = indicator.ma_array(prices, 20)
+    ma60 = indicator.ma_array(prices, 60)
+    if kind == "list_ma":
+        to_list = lambda values: [None if math.isnan(v) else v for v in values.tolist()]
+        return prices.tolist(), to_list(ma20), to_list(ma60)
+    return prices, ma20, ma60
+
+
+def measure(func, args, repeat, track_memory):
+    """최소 실행 시간과 (선택) 최대 메모리 사용량"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    peak = None
+    if track_memory:
+        gc.collect()
+        tracemalloc.start()
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(sizes, limits, repeat=1, track_memory=True, seed=0):
+    results = []
+    for n in sizes:
+        prices = synthetic.synthetic_prices(n, seed)
+        for name, func, kind, limit_name in CASES:
+            if limit_name and n > limits[limit_name]:
+                continue
+            args = prepare(kind, prices)
+            seconds, peak = measure(func, args, repeat, track_memory)
+            row = {
+                "case": name,
+                "bars": n,
+                "seconds": seconds,
+                "bars_per_sec": n / seconds if seconds > 0 else None,
+                "peak_mb": peak / 1e6 if peak is not None else None,
+            }
+            results.append(row)
+            peak_text = f"{row['peak_mb']:9.1f}MB" if peak is not None else ""
+            print(f"{name:<32} {n:>10,} {seconds:>10.4f}s {row['bars_per_sec']:>14,.0f} bars/s {peak_text}")
+    return results
+
+
+def scaling(results):
+    """케이스별 log-log 기울기 (1 이면 선형, 2 이면 제곱 증가)"""
+    curves = {}
+    for row in results:
+        curves.setdefault(row["case"], []).append((row["bars"], row["seconds"]))
+    slopes = {}
+    for case, points in curves.items():
+        points = [(n, s) for n, s in points if s > 0]
+        if len(points) >= 2:
+            x = np.log([n for n, _ in points])
+            y = np.log([s for _, s in points])
+            slopes[case] = float(np.polyfit(x, y, 1)[0])
+    return slopes
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, previous_file):
+    with open(previous_file, "r") as f:
+        previous = json.load(f)
+    before = {(row["case"], row["bars"]): row for row in previous["results"]}
+    print(f"\n📊 비교 대상: {previous_file} (커밋 {previous.get('commit')})")
+    for row in results:
+        old = before.get((row["case"], row["bars"]))
+        if old and old["bars_per_sec"] and row["bars_per_sec"]:
+            ratio = row["bars_per_sec"] / old["bars_per_sec"]
+            mark = "⚠️ " if ratio < 0.9 else "  "
+            print(f"{mark}{row['case']:<32} {row['bars']:>10,} x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="지표/신호/백테스트 벤치마크")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="분봉 수 목록 (쉼표 구분)")
+    parser.add_argument("--naive-limit", type=int, default=30000, help="O(n^2) 케이스 최대 분봉 수")
+    parser.add_argument("--loop-limit", type=int, default=1000000, help="파이썬 루프 케이스 최대 분봉 수")
+    parser.add_argument("--repeat", type=int, default=1, help="반복 횟수 (최소 시간 사용)")
+    parser.add_argument("--no-memory", action="store_true", help="메모리 측정 생략")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="결과 JSON 경로")
+    parser.add_argument("--compare", help="이전 결과 JSON 과 비교")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    limits = {"naive_limit": args.naive_limit, "loop_limit": args.loop_limit}
+    results = run(sizes, limits, args.repeat, not args.no_memory, args.seed)
+
+    slopes = scaling(results)
+    if slopes:
+        print("\n📈 규모 증가에 따른 시간 증가 (log-log 기울기)")
+        for case, slope in slopes.items():
+            print(f"  {case:<32} {slope:.2f}")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "results": results,
+        "scaling": slopes,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 결과 저장: {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
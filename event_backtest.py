@@ -0,0 +1,193 @@
+# event_backtest.py
+"""
+이벤트 기반 백테스트 (지정가 주문 체결 모델)
+
+실시간 루프와 같은 순서로 체결을 흉내냅니다.
+  - t 분봉 종가에서 신호가 나오면 종가로 지정가 주문 (api.order, ORD_DVSN "00")
+  - 주문은 다음 분봉(t + 1) 동안만 유효: 매수는 저가가 지정가 이하, 매도는 고가가 지정가 이상일 때 체결
+    (시가가 지정가보다 유리하면 시가로 체결)
+  - 한 분봉에서 체결 가능한 수량은 체결 거래량(cntg_vol) x 참여율로 제한 (부분 체결)
+  - 다음 사이클(t + 1 종가)에 남은 수량은 취소 (api.clear_orders)
+
+신호는 전략의 벡터화 경로(run)로 한 번에 계산하고, 이벤트 큐에는 신호/체결/취소처럼
+무언가 일어나는 시점만 들어가므로 분봉 수가 많아도 빠르게 처리됩니다.
+
+  python event_backtest.py sample.json
+  python event_backtest.py --synthetic 10000000
+"""
+
+import argparse
+import heapq
+import time
+
+import numpy as np
+
+import bar_cache
+import strategy
+import synthetic
+
+INITIAL_BALANCE = 1000 * 10000
+
+# 같은 시점의 처리 순서: 직전 주문 체결 확인 -> 남은 수량 취소 -> 새 신호로 주문
+FILL, CANCEL, SIGNAL = 0, 1, 2
+
+
+class Order:
+    __slots__ = ("order_id", "side", "price", "quantity", "filled", "placed_at", "status")
+
+    def __init__(self, order_id, side, price, quantity, placed_at):
+        self.order_id = order_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled = 0
+        self.placed_at = placed_at
+        self.status = "OPEN"  # OPEN, FILLED, CANCELLED
+
+
+class Fill:
+    __slots__ = ("time", "order_id", "side", "price", "quantity")
+
+    def __init__(self, time, order_id, side, price, quantity):
+        self.time = time
+        self.order_id = order_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+
+
+class EventBacktester:
+    def __init__(self, bars, ma_strategy=None, initial_balance=INITIAL_BALANCE, participation=0.1):
+        self.close = np.asarray(bars["stck_prpr"])
+        self.open = np.asarray(bars["stck_oprc"])
+        self.high = np.asarray(bars["stck_hgpr"])
+        self.low = np.asarray(bars["stck_lwpr"])
+        self.volume = np.asarray(bars["cntg_vol"])
+        self.strategy = ma_strategy or strategy.MACrossStrategy(20, 60)
+        self.initial_balance = initial_balance
+        self.participation = participation
+
+        self.cash = initial_balance
+        self.quantity = 0
+        self.orders = []
+        self.fills = []
+        self.queue = []
+        self.seq = 0
+
+    def push(self, time, kind, payload):
+        self.seq += 1
+        heapq.heappush(self.queue, (time, kind, self.seq, payload))
+
+    def run(self):
+        signal_index, signals = self.strategy.run(self.close)
+        # 신호 이벤트는 이미 시간 순이므로 힙 조건을 만족하는 리스트로 바로 구성
+        self.queue = [(t, SIGNAL, seq, signal)
+                      for seq, (t, signal) in enumerate(zip(signal_index.tolist(), signals.tolist()))]
+        self.seq = len(self.queue)
+
+        queue = self.queue
+        while queue:
+            time, kind, _, payload = heapq.heappop(queue)
+            if kind == FILL:
+                self.fill(payload, time)
+            elif kind == CANCEL:
+                if payload.status == "OPEN":
+                    payload.status = "CANCELLED"
+            else:
+                self.place(payload, time)
+        return self.result()
+
+    def place(self, side, time):
+        price = self.close[time].item()
+        if side == "BUY":
+            quantity = self.cash // price
+        else:
+            quantity = self.quantity
+        if quantity <= 0 or time + 1 >= len(self.close):
+            return
+        order = Order(len(self.orders), side, price, quantity, time)
+        self.orders.append(order)
+        self.push(time + 1, FILL, order)
+        self.push(time + 1, CANCEL, order)
+
+    def fill(self, order, time):
+        limit = order.price
+        bar_open = self.open[time].item()
+        if order.side == "BUY":
+            if self.low[time].item() > limit:
+                return
+            price = bar_open if bar_open < limit else limit
+        else:
+            if self.high[time].item() < limit:
+                return
+            price = bar_open if bar_open > limit else limit
+
+        capacity = int(self.volume[time].item() * self.participation)
+        quantity = min(order.quantity - order.filled, capacity)
+        if order.side == "BUY":
+            quantity = min(quantity, self.cash // price)
+        if quantity <= 0:
+            return
+
+        order.filled += quantity
+        if order.filled == order.quantity:
+            order.status = "FILLED"
+        if order.side == "BUY":
+            self.cash -= quantity * price
+            self.quantity += quantity
+        else:
+            self.cash += quantity * price
+            self.quantity -= quantity
+        self.fills.append(Fill(time, order.order_id, order.side, price, quantity))
+
+    def result(self):
+        """체결 시점의 현금/수량을 앞으로 채워 수익률 시계열 계산"""
+        fill_times = np.array([fill.time for fill in self.fills], dtype=np.int64)
+        cash = [self.initial_balance]
+        quantity = [0]
+        for fill in self.fills:
+            sign = 1 if fill.side == "BUY" else -1
+            cash.append(cash[-1] - sign * fill.quantity * fill.price)
+            quantity.append(quantity[-1] + sign * fill.quantity)
+
+        state = np.searchsorted(fill_times, np.arange(len(self.close)), side="right")
+        cash = np.asarray(cash)[state]
+        quantity = np.asarray(quantity)[state]
+        interests = ((cash + self.close * quantity) / self.initial_balance - 1) * 100
+
+        statuses = [order.status for order in self.orders]
+        return {
+            "interests": interests,
+            "cash": cash,
+            "quantity": quantity,
+            "orders": len(self.orders),
+            "filled": statuses.count("FILLED"),
+            "partial": sum(1 for order in self.orders if order.status == "CANCELLED" and order.filled),
+            "unfilled": sum(1 for order in self.orders if order.filled == 0),
+            "fills": self.fills,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="지정가 주문 체결 모델 이벤트 기반 백테스트")
+    parser.add_argument("file", nargs="?", default="sample.json", help="분봉 JSON 파일")
+    parser.add_argument("--synthetic", type=int, help="파일 대신 합성 분봉 N개 사용")
+    parser.add_argument("--participation", type=float, default=0.1, help="분봉 거래량 대비 최대 체결 비율")
+    parser.add_argument("--balance", type=int, default=INITIAL_BALANCE, help="초기 현금")
+    args = parser.parse_args()
+
+    bars = synthetic.synthetic_bars(args.synthetic) if args.synthetic else bar_cache.load_bars(args.file)
+    start = time.perf_counter()
+    result = EventBacktester(bars, initial_balance=args.balance, participation=args.participation).run()
+    elapsed = time.perf_counter() - start
+
+    n = len(result["interests"])
+    print(f"📊 분봉 {n:,}개, {elapsed:.3f}초 ({n / elapsed:,.0f} bars/s)")
+    print(f"📝 주문 {result['orders']}건: 전량 체결 {result['filled']}, "
+          f"부분 체결 후 취소 {result['partial']}, 미체결 취소 {result['unfilled']}")
+    if n:
+        print(f"💰 최종 수익률: {result['interests'][-1]:.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,8 +13,7 @@ def get_price():
     if not code or not token:
         return jsonify({"error": "Missing parameters"}), 400
 
-    api.ACCESS_TOKEN = token
-    price = api.fetch_current_price(code)
+    price = api.fetch_current_price(code, token=token)
     if price is not None:
         return jsonify({"price": price})
     else:
@@ -33,8 +32,7 @@ def make_order():
     if not all([order_type, account, code, amount, price, token]):
         return jsonify({"error": "누락된 요청 데이터"}), 400
 
-    api.ACCESS_TOKEN = token
-    success = api.order(order_type, account, code, amount, price)
+    success = api.order(order_type, account, code, amount, price, token=token)
     return jsonify({"success": success})
 
 @app.route("/fetch_quantity")
@@ -45,8 +43,7 @@ def fetch_quantity():
     if not all([account, code, token]):
         return jsonify({"error": "Missing parameters"}), 400
 
-    api.ACCESS_TOKEN = token
-    quantity = api.fetch_quantity(account, code)
+    quantity = api.fetch_quantity(account, code, token=token)
     return jsonify({"quantity": quantity})
 
 @app.route("/clear_orders", methods=["POST"])
@@ -59,8 +56,8 @@ def clear_orders():
     if not all([account, code, token]):
         return jsonify({"error": "누락된 요청 데이터"}), 400
 
-    api.ACCESS_TOKEN = token
-    api.clear_orders(account, code)
+    # 자동매매 루프나 HTS 등 다른 곳에서 낸 주문도 정리하도록 항상 미체결 조회
+    api.clear_orders(account, code, force=True, token=token)
     return jsonify({"message": "미체결 주문 정리 완료"})
 
 @app.route("/fetch_eval")
@@ -70,8 +67,7 @@ def fetch_eval():
     if not all([account, token]):
         return jsonify({"error": "Missing parameters"}), 400
 
-    api.ACCESS_TOKEN = token
-    evaluation = api.fetch_eval(account)
+    evaluation = api.fetch_eval(account, token=token)
     return jsonify({"evaluation": evaluation})
 
 if __name__ == "__main__":
@@ -1,6 +1,360 @@
+import math
+import numpy as np
+
+
 def ma(values, window_size):
     if len(values) >= window_size:
         target_values = values[-window_size:]
         return sum(target_values) / window_size
     else:
         return None
+
+
+class MovingAverage:
+    """고정 크기 링 버퍼와 누적합으로 O(1) 갱신하는 이동평균"""
+    __slots__ = ("window_size", "buffer", "index", "count", "total", "value")
+
+    def __init__(self, window_size, values=()):
+        self.window_size = window_size
+        self.buffer = [0] * window_size
+        self.index = 0
+        self.count = 0
+        self.total = 0
+        self.value = None
+        for value in values:
+            self.update(value)
+
+    def update(self, value):
+        index = self.index
+        if self.count < self.window_size:
+            self.count += 1
+        else:
+            self.total -= self.buffer[index]
+        self.buffer[index] = value
+        self.total += value
+        index += 1
+        if index == self.window_size:
+            index = 0
+            # 실수 입력의 누적 오차를 한 바퀴마다 정리 (정수 가격은 영향 없음)
+            if isinstance(self.total, float):
+                self.total = sum(self.buffer)
+        self.index = index
+
+        if self.count == self.window_size:
+            self.value = self.total / self.window_size
+        return self.value
+
+
+def ma_series(values, window_size):
+    calculator = MovingAverage(window_size)
+    return [calculator.update(value) for value in values]
+
+
+def prefix_sum(values):
+    """마지막 축 앞에 0을 붙인 누적합 (길이 n + 1), 여러 윈도우 크기에서 재사용"""
+    values = np.asarray(values)
+    dtype = np.int64 if np.issubdtype(values.dtype, np.integer) else np.float64
+    result = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,), dtype=dtype)
+    np.cumsum(values, axis=-1, dtype=dtype, out=result[..., 1:])
+    return result
+
+
+def ma_array(values, window_size, prefix=None):
+    """마지막 축 기준 이동평균 (데이터 부족 구간은 NaN, 2차원이면 행마다 계산)"""
+    if prefix is None:
+        prefix = prefix_sum(values)
+    result = np.full(prefix.shape[:-1] + (prefix.shape[-1] - 1,), np.nan)
+    if result.shape[-1] >= window_size:
+        result[..., window_size - 1:] = (prefix[..., window_size:] - prefix[..., :-window_size]) / window_size
+    return result
+
+
+def _smooth_array(values, alpha, start, seed):
+    """result[start] = seed, 이후 result[t] = result[t-1] + alpha * (values[t] - result[t-1]) (앞 구간은 NaN)
+
+    재귀식을 닫힌 형태 decay^t * (seed + alpha * cumsum(values * decay^-k)) 로 한 번에 계산하고,
+    decay^-k 가 넘치지 않도록 일정 길이 구간으로 나눠 구간 끝 값을 다음 구간의 시작값으로 넘김
+    """
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if start >= len(values):
+        return result
+    result[start] = seed
+    decay = 1.0 - alpha
+    if decay <= 0:
+        result[start + 1:] = values[start + 1:]
+        return result
+    chunk = max(1, int(300 / -math.log(decay)))  # decay^-chunk < e^300
+    prev = seed
+    for begin in range(start + 1, len(values), chunk):
+        x = values[begin:begin + chunk]
+        powers = decay ** np.arange(1, len(x) + 1)
+        smoothed = powers * (prev + alpha * np.cumsum(x / powers))
+        result[begin:begin + len(x)] = smoothed
+        prev = smoothed[-1]
+    return result
+
+
+class EMA:
+    """지수이동평균 (처음 period 개는 단순평균으로 시작)"""
+    __slots__ = ("period", "alpha", "count", "total", "value")
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.count = 0
+        self.total = 0
+        self.value = None
+
+    def update(self, value):
+        if self.count < self.period:
+            self.count += 1
+            self.total += value
+            if self.count == self.period:
+                self.value = self.total / self.period
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    @classmethod
+    def batch(cls, values, period):
+        """update 를 전체 배열에 적용한 결과 (부동소수 오차 범위에서 동일)"""
+        values = np.asarray(values, dtype=float)
+        seed = values[:period].mean() if len(values) >= period else np.nan
+        return _smooth_array(values, 2 / (period + 1), period - 1, seed)
+
+
+class RSI:
+    """Wilder 방식 RSI"""
+    __slots__ = ("period", "prev", "count", "avg_gain", "avg_loss", "value")
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev = None
+        self.count = 0
+        self.avg_gain = 0
+        self.avg_loss = 0
+        self.value = None
+
+    def update(self, value):
+        prev = self.prev
+        self.prev = value
+        if prev is None:
+            return None
+        change = value - prev
+        gain = change if change > 0 else 0
+        loss = -change if change < 0 else 0
+
+        period = self.period
+        if self.count < period:
+            self.count += 1
+            self.avg_gain += gain
+            self.avg_loss += loss
+            if self.count < period:
+                return None
+            self.avg_gain /= period
+            self.avg_loss /= period
+        else:
+            self.avg_gain = (self.avg_gain * (period - 1) + gain) / period
+            self.avg_loss = (self.avg_loss * (period - 1) + loss) / period
+
+        if self.avg_loss == 0:
+            self.value = 50.0 if self.avg_gain == 0 else 100.0
+        else:
+            self.value = 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+        return self.value
+
+    @classmethod
+    def batch(cls, values, period=14):
+        """update 를 전체 배열에 적용한 결과 (부동소수 오차 범위에서 동일)"""
+        change = np.diff(np.asarray(values, dtype=float))
+        gain = np.where(change > 0, change, 0.0)
+        loss = np.where(change < 0, -change, 0.0)
+        ready = len(change) >= period
+        avg_gain = _smooth_array(gain, 1 / period, period - 1, gain[:period].mean() if ready else np.nan)
+        avg_loss = _smooth_array(loss, 1 / period, period - 1, loss[:period].mean() if ready else np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsi = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0),
+                           100 - 100 / (1 + avg_gain / avg_loss))
+        rsi[np.isnan(avg_gain)] = np.nan
+        return np.r_[np.nan, rsi] if len(values) else rsi
+
+
+class MACD:
+    """MACD 선, 시그널 선, 히스토그램 (update 는 MACD 선 반환)"""
+    __slots__ = ("fast", "slow", "signal_ema", "value", "signal", "histogram")
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal_ema = EMA(signal)
+        self.value = None
+        self.signal = None
+        self.histogram = None
+
+    def update(self, value):
+        fast = self.fast.update(value)
+        slow = self.slow.update(value)
+        if fast is None or slow is None:
+            return None
+        self.value = fast - slow
+        self.signal = self.signal_ema.update(self.value)
+        if self.signal is not None:
+            self.histogram = self.value - self.signal
+        return self.value
+
+    @classmethod
+    def batch(cls, values, fast=12, slow=26, signal=9):
+        """(MACD, 시그널, 히스토그램) 배열"""
+        macd = EMA.batch(values, fast) - EMA.batch(values, slow)
+        start = max(fast, slow) - 1  # MACD 선이 처음 나오는 시점
+        seed = macd[start:start + signal].mean() if len(macd) >= start + signal else np.nan
+        signal_line = _smooth_array(macd, 2 / (signal + 1), start + signal - 1, seed)
+        return macd, signal_line, macd - signal_line
+
+
+class BollingerBands:
+    """볼린저 밴드 (슬라이딩 Welford 로 평균과 편차 제곱합 갱신, update 는 중심선 반환)
+
+    제곱합 - 평균 제곱 방식은 가격 수준에 비해 변동이 작으면 자릿수가 상쇄되므로
+    편차 제곱합(m2)을 직접 갱신하고, 버퍼를 한 바퀴 돌 때마다 두 값을 버퍼에서 다시 계산해 오차를 정리함
+    """
+    __slots__ = ("window_size", "k", "buffer", "index", "count", "mean", "m2",
+                 "value", "upper", "lower")
+
+    def __init__(self, window_size=20, k=2):
+        self.window_size = window_size
+        self.k = k
+        self.buffer = [0] * window_size
+        self.index = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.value = None
+        self.upper = None
+        self.lower = None
+
+    def update(self, value):
+        index = self.index
+        if self.count < self.window_size:
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        else:
+            old = self.buffer[index]
+            mean = self.mean + (value - old) / self.window_size
+            self.m2 += (value - old) * (value - mean + old - self.mean)
+            self.mean = mean
+        self.buffer[index] = value
+        index += 1
+        if index == self.window_size:
+            index = 0
+            if self.count == self.window_size:
+                self.mean = sum(self.buffer) / self.window_size
+                self.m2 = sum((x - self.mean) ** 2 for x in self.buffer)
+        self.index = index
+
+        if self.count == self.window_size:
+            variance = self.m2 / self.window_size
+            width = self.k * math.sqrt(variance if variance > 0 else 0)
+            self.value = self.mean
+            self.upper = self.mean + width
+            self.lower = self.mean - width
+        return self.value
+
+    @classmethod
+    def batch(cls, values, window_size=20, k=2):
+        """(중심선, 상단, 하단) 배열 (구간마다 평균을 뺀 뒤 분산 계산)"""
+        values = np.asarray(values, dtype=float)
+        middle = np.full(len(values), np.nan)
+        variance = np.full(len(values), np.nan)
+        if len(values) >= window_size:
+            windows = np.lib.stride_tricks.sliding_window_view(values, window_size)
+            middle[window_size - 1:] = windows.mean(axis=-1)
+            variance[window_size - 1:] = windows.var(axis=-1)
+        width = k * np.sqrt(variance)
+        return middle, middle + width, middle - width
+
+
+class ATR:
+    """Wilder 방식 평균 실제 범위 (update(고가, 저가, 종가))"""
+    __slots__ = ("period", "prev_close", "count", "total", "value")
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.count = 0
+        self.total = 0
+        self.value = None
+
+    def update(self, high, low, close):
+        prev_close = self.prev_close
+        self.prev_close = close
+        true_range = high - low
+        if prev_close is not None:
+            if high - prev_close > true_range:
+                true_range = high - prev_close
+            if prev_close - low > true_range:
+                true_range = prev_close - low
+
+        if self.count < self.period:
+            self.count += 1
+            self.total += true_range
+            if self.count == self.period:
+                self.value = self.total / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + true_range) / self.period
+        return self.value
+
+    @classmethod
+    def batch(cls, high, low, close, period=14):
+        """update 를 전체 배열에 적용한 결과 (부동소수 오차 범위에서 동일)"""
+        high, low, close = (np.asarray(a, dtype=float) for a in (high, low, close))
+        true_range = high - low
+        if len(close) > 1:
+            prev_close = close[:-1]
+            true_range[1:] = np.maximum.reduce([true_range[1:], high[1:] - prev_close, prev_close - low[1:]])
+        seed = true_range[:period].mean() if len(true_range) >= period else np.nan
+        return _smooth_array(true_range, 1 / period, period - 1, seed)
+
+
+class VWAP:
+    """당일 누적 거래량 가중 평균가 (대표가격 (고가 + 저가 + 종가) / 3 기준, 날짜가 바뀌면 초기화)"""
+    __slots__ = ("date", "price_volume", "volume", "value")
+
+    def __init__(self):
+        self.date = None
+        self.price_volume = 0
+        self.volume = 0
+        self.value = None
+
+    def update(self, high, low, close, volume, date=None):
+        if date != self.date:
+            self.date = date
+            self.price_volume = 0
+            self.volume = 0
+            self.value = None
+        # 정수 가격이면 합계가 정확하도록 3 으로 나누는 것은 마지막에
+        self.price_volume += (high + low + close) * volume
+        self.volume += volume
+        if self.volume > 0:
+            self.value = self.price_volume / (3 * self.volume)
+        return self.value
+
+    @classmethod
+    def batch(cls, high, low, close, volume, date=None):
+        """날짜 배열이 주어지면 날짜별로 누적을 초기화"""
+        high, low, close, volume = (np.asarray(a) for a in (high, low, close, volume))
+        price_volume = np.cumsum((high + low + close) * volume)
+        total_volume = np.cumsum(volume)
+        if date is not None and len(volume):
+            date = np.asarray(date)
+            starts = np.flatnonzero(np.r_[True, date[1:] != date[:-1]])
+            # 각 시점이 속한 날짜 시작 직전까지의 누적값을 빼서 당일 누적으로 변환
+            day = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(volume)]))
+            offset = starts[day]
+            price_volume = price_volume - np.r_[0, price_volume][offset]
+            total_volume = total_volume - np.r_[0, total_volume][offset]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(total_volume > 0, price_volume / (3 * total_volume), np.nan)
@@ -0,0 +1,137 @@
+# indicator_cache.py
+"""
+프로세스 단위 지표 캐시
+
+(종목코드, 지표, 파라미터) 마다 스트리밍 지표 계산기와 마지막으로 반영한 봉을 보관합니다.
+같은 마지막 봉으로 다시 조회하면 캐시 값을 그대로 돌려주고(hit),
+새 봉이 생겼으면 새 봉만 계산기에 넣어 이어서 계산합니다(extend).
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+import indicator
+
+
+class FloorMovingAverage(indicator.MovingAverage):
+    """updated_main 매매 루프와 같은 정수 내림 이동평균 (total // window)"""
+    __slots__ = ()
+
+    def update(self, value):
+        if super().update(value) is None:
+            return None
+        return self.total // self.window_size
+
+
+# 가격 하나로 갱신하는 지표들
+INDICATORS = {
+    "ma": indicator.MovingAverage,
+    "floor_ma": FloorMovingAverage,
+    "ema": indicator.EMA,
+    "rsi": indicator.RSI,
+    "macd": indicator.MACD,
+    "bollinger": indicator.BollingerBands,
+}
+
+
+class IndicatorCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (code, name, params) -> [계산기, 마지막 봉, 값]
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.evictions = 0
+
+    def get(self, code, name, params, load_bars):
+        """지표 값 조회
+
+        load_bars(since) 는 since 이후의 봉을 [(봉 키, 가격), ...] 오름차순으로 반환해야 함
+        (since 가 None 이면 초기 계산에 필요한 만큼). 봉 키는 증가하는 값(시각, id 등).
+        봉은 락 밖에서 읽고, 그 사이 다른 요청이 먼저 반영한 봉은 _extend 에서 건너뜀.
+        """
+        key = (code, name, tuple(params))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            since = entry[1] if entry is not None else None
+
+        bars = load_bars(since)
+
+        with self.lock:
+            current = self.entries.get(key)
+            if current is None:
+                # 처음 조회했거나 읽는 사이 밀려난 항목 (밀려난 항목은 계산 상태를 그대로 되살림)
+                current = entry or [INDICATORS[name](*params), None, None]
+                self.entries[key] = current
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+            if entry is None:
+                self.misses += 1
+            elif bars and (current[1] is None or bars[-1][0] > current[1]):
+                self.extensions += 1
+            else:
+                self.hits += 1
+            self._extend(current, bars)
+            return current[2]
+
+    def _extend(self, entry, bars):
+        calculator, last_bar, value = entry
+        for bar, price in bars:
+            if last_bar is not None and bar <= last_bar:
+                continue
+            value = calculator.update(price)
+            last_bar = bar
+        entry[1] = last_bar
+        entry[2] = value
+
+    def invalidate(self, code=None):
+        """종목(또는 전체) 캐시 삭제"""
+        with self.lock:
+            if code is None:
+                self.entries.clear()
+            else:
+                for key in [key for key in self.entries if key[0] == code]:
+                    del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "extensions": self.extensions,
+                "evictions": self.evictions,
+            }
+
+
+def price_bar_loader(db_path, code, initial_limit=1000):
+    """매매 루프의 1분 봉을 읽는 load_bars (봉 키는 moving_averages.id)
+
+    price_data 에는 /price, /prices 조회 가격도 섞여 있으므로 루프가 사이클마다 한 행씩 남기는
+    moving_averages 의 가격을 봉으로 씀
+    """
+    def load_bars(since):
+        with closing(sqlite3.connect(db_path)) as conn:
+            if since is None:
+                rows = conn.execute(
+                    "SELECT id, price FROM (SELECT id, price FROM moving_averages WHERE stock_code = ? "
+                    "ORDER BY id DESC LIMIT ?) ORDER BY id",
+                    (code, initial_limit),
+                )
+            else:
+                rows = conn.execute(
+                    "SELECT id, price FROM moving_averages WHERE stock_code = ? AND id > ? ORDER BY id",
+                    (code, since),
+                )
+            return rows.fetchall()
+    return load_bars
+
+
+# 프로세스 공용 캐시
+cache = IndicatorCache()
@@ -0,0 +1,403 @@
+# kis_simulator.py
+"""
+KIS 호환 로컬 모의 거래소 (오프라인 부하/지연 테스트용)
+
+api.py / async_api.py / token_manager.py 가 쓰는 엔드포인트를 같은 요청/응답 형식으로 흉내 냅니다.
+가격은 기록된 분봉을 bar_seconds 초마다 한 봉씩 재생하고, 지정가 주문은 메모리 매칭 엔진이
+봉의 고가/저가와 거래량(participation 비율)으로 체결합니다.
+응답 지연, 오류 주입, 초당 요청 수 제한(EGW00201)을 설정할 수 있습니다.
+
+  python kis_simulator.py --bars sample.json --port 18090
+  KIS_BASE_URL=http://127.0.0.1:18090 python updated_main.py
+
+  --latency 0.03 --jitter 0.02      요청마다 30±20ms 지연
+  --error-rate 0.01                 1% 요청에 HTTP 500
+  --rate 20                         앱키당 초당 20건 초과시 EGW00201
+"""
+
+import argparse
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+from flask import Flask, jsonify, request
+from werkzeug.serving import WSGIRequestHandler
+
+import bar_cache
+
+BALANCE_PAGE_SIZE = 20
+CCLD_PAGE_SIZE = 100
+
+
+class SimOrder:
+    __slots__ = ("odno", "code", "side", "quantity", "price", "filled", "filled_amount",
+                 "cancelled", "order_date", "order_time", "original_odno")
+
+    def __init__(self, odno, code, side, quantity, price, order_date, order_time, original_odno=""):
+        self.odno = odno
+        self.code = code
+        self.side = side  # BUY, SELL
+        self.quantity = quantity
+        self.price = price
+        self.filled = 0
+        self.filled_amount = 0
+        self.cancelled = False
+        self.order_date = order_date
+        self.order_time = order_time
+        self.original_odno = original_odno
+
+    @property
+    def remaining(self):
+        return 0 if self.cancelled else self.quantity - self.filled
+
+    def row(self, name):
+        """inquire-daily-ccld output1 행"""
+        return {
+            "ord_dt": self.order_date,
+            "ord_gno_brno": "91252",
+            "odno": self.odno,
+            "orgn_odno": self.original_odno,
+            "sll_buy_dvsn_cd": "01" if self.side == "SELL" else "02",
+            "pdno": self.code,
+            "prdt_name": name,
+            "ord_qty": str(self.quantity),
+            "ord_unpr": str(self.price),
+            "ord_tmd": self.order_time,
+            "tot_ccld_qty": str(self.filled),
+            "avg_prvs": str(self.filled_amount // self.filled if self.filled else 0),
+            "cncl_yn": "Y" if self.cancelled else "N",
+            "tot_ccld_amt": str(self.filled_amount),
+            "rmn_qty": str(self.remaining),
+            "rjct_qty": "0",
+        }
+
+
+class Exchange:
+    """분봉 재생 가격 + 지정가 매칭 엔진 + 계좌 하나 (모든 메서드는 lock 안에서 실행)"""
+
+    def __init__(self, bars_file, bar_seconds=1.0, cash=10_000_000, participation=1.0):
+        bars = bar_cache.load_bars(bars_file)
+        self.close = np.asarray(bars["stck_prpr"])
+        self.open = np.asarray(bars["stck_oprc"])
+        self.high = np.asarray(bars["stck_hgpr"])
+        self.low = np.asarray(bars["stck_lwpr"])
+        self.volume = np.asarray(bars["cntg_vol"])
+        self.bar_seconds = bar_seconds
+        self.participation = participation
+        self.started = time.monotonic()
+        self.processed = {}  # 종목코드 -> 매칭까지 끝난 봉 번호
+        self.cash = cash
+        self.holdings = {}  # 종목코드 -> [수량, 매입금액]
+        self.orders = []  # 주문번호 순서
+        self.by_odno = {}
+        self.sequence = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def bar_index(self):
+        """지금 재생 중인 봉 번호 (끝까지 가면 처음부터 다시, 종목마다 시작 위치만 다름)"""
+        return int((time.monotonic() - self.started) / self.bar_seconds)
+
+    def _bar(self, code, index):
+        offset = int(code) if code.isdigit() else 0
+        return (index + offset) % len(self.close)
+
+    def advance(self, code):
+        """마지막 처리 이후 지나간 봉으로 미체결 주문 매칭, 현재가 반환"""
+        now = self.bar_index()
+        last = self.processed.get(code)
+        if last is not None and last < now:
+            resting = [order for order in self.orders if order.code == code and order.remaining > 0]
+            if resting:
+                for index in range(max(last + 1, now - len(self.close)), now + 1):
+                    self._match_bar(resting, self._bar(code, index))
+        self.processed[code] = now
+        return int(self.close[self._bar(code, now)])
+
+    def _match_bar(self, orders, bar):
+        available = int(self.volume[bar] * self.participation)
+        for order in orders:
+            if order.remaining <= 0 or available <= 0:
+                continue
+            if order.side == "BUY" and self.low[bar] <= order.price:
+                price = min(order.price, int(self.open[bar]))
+            elif order.side == "SELL" and self.high[bar] >= order.price:
+                price = max(order.price, int(self.open[bar]))
+            else:
+                continue
+            quantity = min(order.remaining, available)
+            available -= quantity
+            self._fill(order, quantity, price)
+
+    def _fill(self, order, quantity, price):
+        order.filled += quantity
+        order.filled_amount += quantity * price
+        holding = self.holdings.setdefault(order.code, [0, 0])
+        if order.side == "BUY":
+            # 주문시 지정가로 묶어 둔 금액 중 체결가와의 차액 환급
+            self.cash += quantity * (order.price - price)
+            holding[0] += quantity
+            holding[1] += quantity * price
+        else:
+            holding[1] -= holding[1] * quantity // holding[0]
+            holding[0] -= quantity
+            self.cash += quantity * price
+
+    def reserved_quantity(self, code):
+        return sum(order.remaining for order in self.orders
+                   if order.code == code and order.side == "SELL" and order.remaining > 0)
+
+    def place(self, side, code, quantity, price):
+        """지정가 주문 접수 (매수는 주문 금액을 묶어 둠), (주문, 오류 메시지) 반환"""
+        current = self.advance(code)
+        if quantity <= 0 or price <= 0:
+            return None, "주문수량/단가를 확인하세요"
+        if side == "BUY" and quantity * price > self.cash:
+            return None, "주문가능금액을 초과 했습니다"
+        if side == "SELL" and quantity > self.holdings.get(code, [0, 0])[0] - self.reserved_quantity(code):
+            return None, "주문가능수량을 초과 했습니다"
+        now = datetime.now()
+        order = SimOrder(f"{next(self.sequence):010d}", code, side, quantity, price,
+                         now.strftime("%Y%m%d"), now.strftime("%H%M%S"))
+        if side == "BUY":
+            self.cash -= quantity * price
+        self.orders.append(order)
+        self.by_odno[order.odno] = order
+        # 현재가보다 유리한 지정가는 즉시 체결
+        if (side == "BUY" and price >= current) or (side == "SELL" and price <= current):
+            self._fill(order, quantity, current)
+        return order, None
+
+    def cancel(self, odno):
+        order = self.by_odno.get(odno.zfill(10))
+        if order is None or order.remaining <= 0:
+            return None, "정정취소가능수량이 없습니다"
+        if order.side == "BUY":
+            self.cash += order.remaining * order.price
+        now = datetime.now()
+        cancel = SimOrder(f"{next(self.sequence):010d}", order.code, order.side, order.remaining, 0,
+                          now.strftime("%Y%m%d"), now.strftime("%H%M%S"), original_odno=order.odno)
+        cancel.cancelled = True
+        order.cancelled = True
+        self.orders.append(cancel)
+        self.by_odno[cancel.odno] = cancel
+        return cancel, None
+
+    def balance_rows(self):
+        rows = []
+        for code, (quantity, cost) in sorted(self.holdings.items()):
+            if quantity <= 0:
+                continue
+            price = self.advance(code)
+            rows.append({
+                "pdno": code,
+                "prdt_name": f"SIM{code}",
+                "hldg_qty": str(quantity),
+                "ord_psbl_qty": str(quantity - self.reserved_quantity(code)),
+                "pchs_avg_pric": f"{cost / quantity:.4f}",
+                "pchs_amt": str(cost),
+                "prpr": str(price),
+                "evlu_amt": str(quantity * price),
+                "evlu_pfls_amt": str(quantity * price - cost),
+            })
+        return rows
+
+
+class KISRequestHandler(WSGIRequestHandler):
+    """tr_id, tr_cont 처럼 밑줄이 들어간 헤더는 개발 서버가 버리므로 environ 에 다시 넣음"""
+
+    def make_environ(self):
+        environ = super().make_environ()
+        for key, value in self.headers.items():
+            if "_" in key:
+                environ.setdefault("HTTP_" + key.upper().replace("-", "_"), value)
+        return environ
+
+
+def page(rows, request_args, size):
+    """CTX_AREA_NK100 에 다음 시작 위치를 넣는 연속 조회 (다음 페이지가 있으면 tr_cont M)"""
+    start = int(request_args.get("CTX_AREA_NK100") or 0)
+    chunk = rows[start:start + size]
+    more = start + size < len(rows)
+    return chunk, {"ctx_area_fk100": request_args.get("CTX_AREA_FK100", ""),
+                   "ctx_area_nk100": str(start + size) if more else ""}, "M" if more else "D"
+
+
+def create_app(exchange, latency=0.0, jitter=0.0, error_rate=0.0, rate=20.0):
+    app = Flask(__name__)
+    windows = {}  # 앱키 -> 최근 1초 동안 받아들인 요청 시각 (KIS 처럼 1초 구간 건수로 제한)
+    stats = {"requests": 0, "rate_limited": 0, "injected_errors": 0}
+    lock = threading.Lock()  # windows, stats (요청 스레드마다 갱신)
+    tokens = itertools.count(1)
+
+    def reply(body, tr_cont="D", status=200):
+        response = jsonify(body)
+        response.status_code = status
+        response.headers["tr_id"] = request.headers.get("tr_id", "")
+        response.headers["tr_cont"] = tr_cont
+        return response
+
+    def fail(msg_cd, msg1, status=200):
+        return reply({"rt_cd": "1", "msg_cd": msg_cd, "msg1": msg1}, status=status)
+
+    @app.before_request
+    def gate():
+        if request.path == "/" or request.path.startswith("/sim/"):
+            return None
+        with lock:
+            stats["requests"] += 1
+        if latency or jitter:
+            time.sleep(max(latency + random.uniform(-jitter, jitter), 0))
+        if request.path.startswith("/uapi/") and rate:
+            with lock:
+                window = windows.setdefault(request.headers.get("appkey", ""), deque())
+                now = time.monotonic()
+                while window and window[0] <= now - 1.0:
+                    window.popleft()
+                limited = len(window) >= rate
+                if limited:
+                    stats["rate_limited"] += 1
+                else:
+                    window.append(now)
+            if limited:
+                return fail("EGW00201", "초당 거래건수를 초과하였습니다.", status=500)
+        if error_rate and random.random() < error_rate:
+            with lock:
+                stats["injected_errors"] += 1
+            return fail("SIM00500", "모의 거래소 오류 주입", status=500)
+        return None
+
+    @app.route("/", methods=["GET", "HEAD"])
+    def index():
+        return "KIS simulator"
+
+    @app.route("/oauth2/tokenP", methods=["POST"])
+    def token():
+        return jsonify({"access_token": f"sim-token-{next(tokens)}", "token_type": "Bearer",
+                        "expires_in": 86400})
+
+    @app.route("/oauth2/Approval", methods=["POST"])
+    def approval():
+        return jsonify({"approval_key": f"sim-approval-{next(tokens)}"})
+
+    @app.route("/uapi/domestic-stock/v1/quotations/inquire-price")
+    def inquire_price():
+        code = request.args.get("FID_INPUT_ISCD", "")
+        with exchange.lock:
+            price = exchange.advance(code)
+        return reply({"rt_cd": "0", "msg_cd": "MCA00000", "msg1": "정상처리 되었습니다.",
+                      "output": {"stck_prpr": str(price), "stck_shrn_iscd": code}})
+
+    @app.route("/uapi/domestic-stock/v1/trading/inquire-psbl-order")
+    def inquire_psbl_order():
+        price = int(request.args.get("ORD_UNPR") or 0)
+        with exchange.lock:
+            exchange.advance(request.args.get("PDNO", ""))
+            cash = exchange.cash
+        quantity = cash // price if price > 0 else 0
+        return reply({"rt_cd": "0", "msg_cd": "MCA00000", "msg1": "정상처리 되었습니다.",
+                      "output": {"ord_psbl_cash": str(cash), "nrcvb_buy_qty": str(quantity),
+                                 "max_buy_qty": str(quantity)}})
+
+    @app.route("/uapi/domestic-stock/v1/trading/inquire-balance")
+    def inquire_balance():
+        with exchange.lock:
+            rows = exchange.balance_rows()
+            cash = exchange.cash
+            reserved = sum(order.remaining * order.price for order in exchange.orders
+                           if order.side == "BUY" and order.remaining > 0)
+        chunk, context, tr_cont = page(rows, request.args, BALANCE_PAGE_SIZE)
+        stock_eval = sum(int(row["evlu_amt"]) for row in rows)
+        return reply(dict(context, rt_cd="0", msg_cd="KIOK0510", msg1="조회가 완료되었습니다",
+                          output1=chunk, output2=[{
+                              "dnca_tot_amt": str(cash + reserved),
+                              "scts_evlu_amt": str(stock_eval),
+                              "tot_evlu_amt": str(cash + reserved + stock_eval),
+                          }]), tr_cont)
+
+    @app.route("/uapi/domestic-stock/v1/trading/inquire-daily-ccld")
+    def inquire_daily_ccld():
+        args = request.args
+        start, end = args.get("INQR_STRT_DT", ""), args.get("INQR_END_DT", "99999999")
+        code, ccld = args.get("PDNO", ""), args.get("CCLD_DVSN", "00")
+        with exchange.lock:
+            for held in {order.code for order in exchange.orders}:
+                exchange.advance(held)
+            rows = [order.row(f"SIM{order.code}") for order in exchange.orders
+                    if start <= order.order_date <= end and (not code or order.code == code)
+                    and (ccld == "00" or (ccld == "01" and order.filled > 0)
+                         or (ccld == "02" and order.remaining > 0))]
+        if args.get("INQR_DVSN", "00") == "00":
+            rows.reverse()  # 역순
+        chunk, context, tr_cont = page(rows, args, CCLD_PAGE_SIZE)
+        return reply(dict(context, rt_cd="0", msg_cd="KIOK0460", msg1="조회 되었습니다.",
+                          output1=chunk, output2={}), tr_cont)
+
+    @app.route("/uapi/domestic-stock/v1/trading/order-cash", methods=["POST"])
+    def order_cash():
+        body = request.get_json(force=True)
+        side = {"TTTC0012U": "BUY", "TTTC0011U": "SELL", "VTTC0012U": "BUY", "VTTC0011U": "SELL"}.get(
+            request.headers.get("tr_id"))
+        if side is None:
+            return fail("SIM00400", "지원하지 않는 tr_id 입니다")
+        with exchange.lock:
+            order, error = exchange.place(side, body.get("PDNO", ""), int(body.get("ORD_QTY") or 0),
+                                          int(body.get("ORD_UNPR") or 0))
+        if error:
+            return fail("APBK0919", error)
+        return reply({"rt_cd": "0", "msg_cd": "APBK0013", "msg1": "주문 전송 완료 되었습니다.",
+                      "output": {"KRX_FWDG_ORD_ORGNO": "91252", "ODNO": order.odno,
+                                 "ORD_TMD": order.order_time}})
+
+    @app.route("/uapi/domestic-stock/v1/trading/order-rvsecncl", methods=["POST"])
+    def order_rvsecncl():
+        body = request.get_json(force=True)
+        if body.get("RVSE_CNCL_DVSN_CD") != "02":
+            return fail("SIM00400", "정정 주문은 지원하지 않습니다")
+        with exchange.lock:
+            order, error = exchange.cancel(body.get("ORGN_ODNO", ""))
+        if error:
+            return fail("APBK0344", error)
+        return reply({"rt_cd": "0", "msg_cd": "APBK0013", "msg1": "주문 전송 완료 되었습니다.",
+                      "output": {"KRX_FWDG_ORD_ORGNO": "91252", "ODNO": order.odno,
+                                 "ORD_TMD": order.order_time}})
+
+    @app.route("/sim/status")
+    def sim_status():
+        """모의 거래소 상태 (요청/제한/오류 주입 건수, 계좌)"""
+        with lock:
+            counts = dict(stats)
+        with exchange.lock:
+            return jsonify(dict(counts, bar=exchange.bar_index(), cash=exchange.cash,
+                                holdings={code: held[0] for code, held in exchange.holdings.items() if held[0]},
+                                orders=len(exchange.orders),
+                                open_orders=sum(1 for order in exchange.orders if order.remaining > 0)))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KIS 호환 로컬 모의 거래소")
+    parser.add_argument("--bars", default="sample.json", help="가격 재생용 분봉 JSON")
+    parser.add_argument("--port", type=int, default=18090, help="포트")
+    parser.add_argument("--bar-seconds", type=float, default=1.0, help="분봉 하나를 재생하는 시간 (초)")
+    parser.add_argument("--cash", type=int, default=10_000_000, help="초기 예수금")
+    parser.add_argument("--participation", type=float, default=1.0, help="봉 거래량 중 체결 가능한 비율")
+    parser.add_argument("--latency", type=float, default=0.0, help="요청당 응답 지연 (초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="응답 지연 편차 (초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 오류 주입 비율")
+    parser.add_argument("--rate", type=float, default=20.0, help="앱키당 초당 요청 수 (0이면 제한 없음)")
+    args = parser.parse_args()
+
+    exchange = Exchange(args.bars, args.bar_seconds, args.cash, args.participation)
+    app = create_app(exchange, args.latency, args.jitter, args.error_rate, args.rate)
+    print(f"🏦 KIS 모의 거래소: http://127.0.0.1:{args.port} ({args.bars}, 봉당 {args.bar_seconds}초)")
+    print(f"   KIS_BASE_URL=http://127.0.0.1:{args.port} 로 api.py 가 이 서버를 사용합니다")
+    app.run(host="127.0.0.1", port=args.port, threaded=True, request_handler=KISRequestHandler)
+
+
+if __name__ == "__main__":
+    main()
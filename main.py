@@ -1,5 +1,4 @@
 from time import sleep
-import indicator
 import strategy
 import api
 from dotenv import load_dotenv
@@ -10,28 +9,24 @@ load_dotenv()
 APPKEY = os.environ["APPKEY"]
 APPSECRET = os.environ["APPSECRET"]
 ACCOUNT = os.environ["ACCOUNT"]
-ACCESS_TOKEN = os.environ["ACCESS_TOKEN"]
+ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN")
 
 CODE = "122640"
 
 # 자동 매매 코드
 
 prices = []
-ma20 = []
-ma60 = []
+ma_strategy = strategy.MACrossStrategy(20, 60)
 
 while True:
     # 현재 가격 조회
     current_price = api.fetch_current_price("122640")
     if current_price is not None:
         prices.append(current_price)
-        # 이동 평균선 계산
-        ma20.append(indicator.ma(prices, 20))
-        ma60.append(indicator.ma(prices, 60))
-        # 투자 전략 확인
-        signal = strategy.ma_signal(ma20, ma60)
+        # 이동 평균선 계산 및 투자 전략 확인
+        signal = ma_strategy.on_bar(current_price)
         print(
-            f"가격: {prices[-1]} MA20: {ma20[-1]} MA60: {ma60[-1]} 시그널: {signal}")
+            f"가격: {prices[-1]} MA20: {ma_strategy.short.value} MA60: {ma_strategy.long.value} 시그널: {signal}")
         # 과거 주문을 조회하고 미체결된 주문이 있으면 취소하기
         api.clear_orders(ACCOUNT, CODE)
 
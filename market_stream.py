@@ -0,0 +1,360 @@
+# market_stream.py
+"""
+KIS 실시간 체결가 스트림 (WebSocket H0STCNT0)
+
+REST 시세를 주기적으로 조회하는 대신 WebSocket 으로 종목별 실시간 체결을 구독하고,
+프레임을 Tick 으로 풀어 같은 프로세스의 구독자(콜백)에게 바로 전달합니다.
+연결이 끊기거나 접속키 발급이 실패하면 지터를 준 지수 백오프로 다시 시도하고 구독 종목을 모두 다시 등록합니다.
+구독이 거부되거나 접속키가 유효 시간(24시간)에 가까워지면 다음 연결에서 접속키를 새로 발급합니다.
+해석할 수 없는 프레임은 기록만 하고 건너뜁니다.
+
+    stream = MarketStream(["122640"])
+    stream.subscribe(lambda tick: print(tick.code, tick.price))
+    stream.start()                      # 백그라운드 스레드에서 수신
+    stream.latest("122640")             # 가장 최근 Tick (없으면 None)
+
+테스트용 로컬 서버는 분봉 JSON 을 체결 프레임으로 재생합니다.
+
+  python market_stream.py 122640                          실서버 실시간 체결 출력
+  python market_stream.py 122640 --replay sample.json     로컬 재생 서버에 연결
+  python market_stream.py 122640 --replay sample.json --drop-every 500   재연결 확인
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import requests
+import websockets
+from dotenv import load_dotenv
+
+import bar_cache
+
+load_dotenv()
+
+BASE_URL = os.environ.get("KIS_BASE_URL", "https://openapi.koreainvestment.com:9443")
+WS_URL = os.environ.get("KIS_WS_URL", "ws://ops.koreainvestment.com:21000")
+
+TR_TRADE = "H0STCNT0"  # 국내주식 실시간 체결가
+TRADE_FIELDS = 46      # H0STCNT0 레코드 하나의 필드 수
+APPROVAL_TTL = 23 * 3600  # 접속키 재발급 주기 (24시간 유효, 만료 직전 연결을 피하도록 여유)
+
+
+class Tick:
+    """실시간 체결 한 건 (H0STCNT0 에서 쓰는 필드만 보관)"""
+    __slots__ = ("code", "time", "price", "open", "high", "low", "ask", "bid",
+                 "volume", "cum_volume", "side", "received")
+
+    def __init__(self, code, time, price, open, high, low, ask, bid, volume, cum_volume, side, received):
+        self.code = code
+        self.time = time              # 체결 시각 HHMMSS
+        self.price = price
+        self.open = open
+        self.high = high
+        self.low = low
+        self.ask = ask                # 매도호가1
+        self.bid = bid                # 매수호가1
+        self.volume = volume          # 체결 거래량
+        self.cum_volume = cum_volume  # 누적 거래량
+        self.side = side              # 1: 매수 체결, 5: 매도 체결
+        self.received = received      # 수신 시각 (time.time)
+
+    @classmethod
+    def from_fields(cls, fields, offset, received):
+        f = fields
+        i = offset
+        return cls(f[i], int(f[i + 1]), int(f[i + 2]), int(f[i + 7]), int(f[i + 8]), int(f[i + 9]),
+                   int(f[i + 10]), int(f[i + 11]), int(f[i + 12]), int(f[i + 13]), f[i + 21], received)
+
+    def __repr__(self):
+        return f"Tick({self.code} {self.time:06d} {self.price:,} x{self.volume})"
+
+
+def parse_frame(message, received=None):
+    """실시간 프레임 -> Tick 목록 (제어용 JSON 메시지면 None)
+
+    데이터 프레임: "0|H0STCNT0|건수|필드^필드^..." (건수만큼 레코드가 이어 붙어 옴, 1 로 시작하면 암호화)
+    """
+    if message[:1] not in ("0", "1"):
+        return None
+    encrypted, tr_id, count, payload = message.split("|", 3)
+    if encrypted == "1" or tr_id != TR_TRADE:
+        return []  # 체결 통보 등 암호화 채널은 구독하지 않음
+    received = time.time() if received is None else received
+    fields = payload.split("^")
+    return [Tick.from_fields(fields, i * TRADE_FIELDS, received) for i in range(int(count))]
+
+
+def issue_approval_key(base_url=None, appkey=None, appsecret=None):
+    """웹소켓 접속키 발급 (/oauth2/Approval, 24시간 유효)"""
+    res = requests.post(f"{base_url or BASE_URL}/oauth2/Approval", json={
+        "grant_type": "client_credentials",
+        "appkey": appkey or os.environ["APPKEY"],
+        "secretkey": appsecret or os.environ["APPSECRET"],
+    }, timeout=(3.05, 10))
+    data = res.json()
+    if "approval_key" not in data:
+        raise RuntimeError(f"웹소켓 접속키 발급 실패: {data}")
+    return data["approval_key"]
+
+
+def subscription_message(approval_key, code, subscribe=True, tr_id=TR_TRADE):
+    return json.dumps({
+        "header": {
+            "approval_key": approval_key,
+            "custtype": "P",
+            "tr_type": "1" if subscribe else "2",  # 1: 등록, 2: 해제
+            "content-type": "utf-8",
+        },
+        "body": {"input": {"tr_id": tr_id, "tr_key": code}},
+    })
+
+
+class MarketStream:
+    def __init__(self, codes=(), url=None, approval_key=None, reconnect_delay=0.5, max_delay=30.0):
+        self.url = url or WS_URL
+        self.approval_key = approval_key
+        self.approval_issued = time.time() if approval_key else None  # 접속키 발급(또는 전달받은) 시각
+        self.codes = set(codes)
+        self.reconnect_delay = reconnect_delay
+        self.max_delay = max_delay
+        self.subscribers = []
+        self.ticks = {}  # 종목코드 -> 가장 최근 Tick
+        self.lock = threading.Lock()
+        self.loop = None
+        self.thread = None
+        self.websocket = None
+        self.stopped = False
+        self.received = 0
+        self.reconnects = 0
+        self.dropped = 0  # 해석하지 못하고 건너뛴 프레임 수
+        self.connected = threading.Event()
+
+    def subscribe(self, callback):
+        """Tick 마다 callback(tick) 호출 (수신 스레드에서 실행), 해제 함수 반환"""
+        with self.lock:
+            self.subscribers = self.subscribers + [callback]
+
+        def unsubscribe():
+            with self.lock:
+                self.subscribers = [s for s in self.subscribers if s is not callback]
+        return unsubscribe
+
+    def latest(self, code, max_age=None):
+        """가장 최근 Tick (max_age 초보다 오래됐거나 아직 없으면 None)"""
+        tick = self.ticks.get(code)
+        if tick is None or (max_age is not None and time.time() - tick.received > max_age):
+            return None
+        return tick
+
+    def add(self, code):
+        self.codes.add(code)
+        self._send_threadsafe(code, True)
+
+    def remove(self, code):
+        self.codes.discard(code)
+        self._send_threadsafe(code, False)
+
+    def _send_threadsafe(self, code, subscribe):
+        # 접속키가 없으면 다음 연결에서 새 접속키로 전체 구독을 다시 등록함
+        if self.loop is not None and self.websocket is not None and self.approval_key is not None:
+            message = subscription_message(self.approval_key, code, subscribe)
+            asyncio.run_coroutine_threadsafe(self.websocket.send(message), self.loop)
+
+    def publish(self, ticks):
+        subscribers = self.subscribers
+        for tick in ticks:
+            self.ticks[tick.code] = tick
+            for callback in subscribers:
+                try:
+                    callback(tick)
+                except Exception as e:
+                    print(f"❌ 시세 구독자 오류: {e}")
+        self.received += len(ticks)
+
+    async def _handle(self, websocket, message):
+        ticks = parse_frame(message)
+        if ticks is not None:
+            self.publish(ticks)
+            return
+        data = json.loads(message)
+        header = data.get("header", {})
+        if header.get("tr_id") == "PINGPONG":
+            await websocket.send(message)  # 서버 PINGPONG 은 그대로 돌려줘야 연결 유지
+        elif data.get("body", {}).get("rt_cd") not in (None, "0"):
+            print(f"❌ 구독 실패 {header.get('tr_key')}: {data['body'].get('msg1')}")
+            self.approval_key = None  # 만료/무효 접속키일 수 있으므로 다음 연결에서 새로 발급
+
+    async def run(self):
+        """접속키 발급 -> 연결 -> 전체 구독 -> 수신, 실패하거나 끊기면 백오프 후 재시도 (stop() 까지 반복)"""
+        self.loop = asyncio.get_running_loop()
+        delay = self.reconnect_delay
+        while not self.stopped:
+            if self.approval_key is not None and time.time() - self.approval_issued > APPROVAL_TTL:
+                self.approval_key = None
+            if self.approval_key is None:
+                try:
+                    self.approval_key = await asyncio.to_thread(issue_approval_key)
+                    self.approval_issued = time.time()
+                except (requests.RequestException, RuntimeError, ValueError) as e:
+                    print(f"⚠️ 웹소켓 접속키 발급 재시도 ({e})")
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                    delay = min(delay * 2, self.max_delay)
+                    continue
+            try:
+                async with websockets.connect(self.url, ping_interval=None, max_queue=None) as websocket:
+                    self.websocket = websocket
+                    for code in sorted(self.codes):
+                        await websocket.send(subscription_message(self.approval_key, code))
+                    self.connected.set()
+                    async for message in websocket:
+                        delay = self.reconnect_delay  # 수신이 되면 백오프 초기화
+                        try:
+                            await self._handle(websocket, message)
+                        except (ValueError, IndexError) as e:  # json.JSONDecodeError 는 ValueError
+                            self.dropped += 1
+                            print(f"⚠️ 시세 프레임 해석 실패 ({e}): {message[:80]!r}")
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                if self.stopped:
+                    break
+                print(f"⚠️ 시세 스트림 연결 끊김: {e}")
+            finally:
+                self.websocket = None
+                self.connected.clear()
+            if self.stopped:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, self.max_delay)
+
+    def start(self):
+        """백그라운드 데몬 스레드에서 run() 실행 (동기 코드용)"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=asyncio.run, args=(self.run(),),
+                                           name="kis-market-stream", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self.stopped = True
+        if self.loop is not None and self.websocket is not None:
+            asyncio.run_coroutine_threadsafe(self.websocket.close(), self.loop)
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def status(self):
+        return {
+            "connected": self.connected.is_set(),
+            "codes": sorted(self.codes),
+            "received": self.received,
+            "reconnects": self.reconnects,
+            "dropped": self.dropped,
+        }
+
+
+def trade_frames(filename, code, batch=1):
+    """분봉 JSON -> H0STCNT0 프레임 목록 (batch 개 레코드씩 한 프레임)"""
+    bars = bar_cache.load_bars(filename)
+    close = np.asarray(bars["stck_prpr"])
+    columns = (bars["stck_cntg_hour"], close, bars["stck_oprc"], bars["stck_hgpr"],
+               bars["stck_lwpr"], bars["cntg_vol"], np.cumsum(bars["cntg_vol"]))
+    empty = ["0"] * TRADE_FIELDS
+    records = []
+    for hour, price, open_, high, low, volume, cum_volume in zip(*(np.asarray(c).tolist() for c in columns)):
+        fields = list(empty)
+        fields[0], fields[1], fields[2] = code, f"{hour:06d}", str(price)
+        fields[7], fields[8], fields[9] = str(open_), str(high), str(low)
+        fields[10], fields[11] = str(price), str(price)
+        fields[12], fields[13], fields[21] = str(volume), str(cum_volume), "1"
+        records.append("^".join(fields))
+    return [f"0|{TR_TRADE}|{len(records[i:i + batch]):03d}|" + "^".join(records[i:i + batch])
+            for i in range(0, len(records), batch)]
+
+
+async def serve_replay(filename, host="127.0.0.1", port=18765, interval=0.0, drop_every=0, ready=None):
+    """기록된 분봉을 체결 프레임으로 재생하는 로컬 웹소켓 서버
+
+    구독 메시지를 받은 종목마다 프레임을 interval 초 간격으로 보냄.
+    drop_every 개를 보낼 때마다 연결을 끊어 재연결/재구독을 시험 (다음 연결은 이어서 재생).
+    """
+    frames = {}
+    sent = {}
+
+    async def handler(websocket):
+        async for message in websocket:
+            request = json.loads(message)
+            code = request["body"]["input"]["tr_key"]
+            await websocket.send(json.dumps({
+                "header": {"tr_id": TR_TRADE, "tr_key": code, "encrypt": "N"},
+                "body": {"rt_cd": "0", "msg_cd": "OPSP0000", "msg1": "SUBSCRIBE SUCCESS"},
+            }))
+            if code not in frames:
+                frames[code] = trade_frames(filename, code)
+                sent[code] = 0
+            for count, frame in enumerate(frames[code][sent[code]:], 1):
+                await websocket.send(frame)
+                sent[code] += 1
+                if drop_every and count % drop_every == 0:
+                    await websocket.close()
+                    return
+                if interval:
+                    await asyncio.sleep(interval)
+
+    async with websockets.serve(handler, host, port):
+        if ready is not None:
+            ready.set()
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KIS 실시간 체결가 스트림")
+    parser.add_argument("codes", nargs="+", help="종목코드")
+    parser.add_argument("--url", default=None, help="웹소켓 주소 (기본: KIS_WS_URL 또는 실서버)")
+    parser.add_argument("--replay", default=None, help="분봉 JSON 을 재생하는 로컬 서버에 연결")
+    parser.add_argument("--port", type=int, default=18765, help="로컬 재생 서버 포트")
+    parser.add_argument("--interval", type=float, default=0.0, help="재생 프레임 간격 (초)")
+    parser.add_argument("--drop-every", type=int, default=0, help="재생 서버가 N 프레임마다 연결 끊기")
+    parser.add_argument("--verbose", action="store_true", help="Tick 마다 출력")
+    args = parser.parse_args()
+
+    url, approval_key = args.url, None
+    if args.replay:
+        ready = threading.Event()
+        threading.Thread(target=asyncio.run, daemon=True, args=(serve_replay(
+            args.replay, port=args.port, interval=args.interval, drop_every=args.drop_every, ready=ready),)).start()
+        ready.wait()
+        url, approval_key = f"ws://127.0.0.1:{args.port}", "replay"
+
+    latencies = []
+
+    def on_tick(tick):
+        latencies.append(time.time() - tick.received)
+        if args.verbose:
+            print(tick)
+
+    stream = MarketStream(args.codes, url=url, approval_key=approval_key)
+    stream.subscribe(on_tick)
+    started = time.perf_counter()
+    stream.start()
+    try:
+        while True:
+            time.sleep(1)
+            status = stream.status()
+            elapsed = time.perf_counter() - started
+            print(f"📡 {status['received']:,}건 수신 ({status['received'] / elapsed:,.0f}건/초), "
+                  f"재연결 {status['reconnects']}회, 최근가 "
+                  + ", ".join(f"{code} {stream.ticks[code].price:,}" for code in args.codes if code in stream.ticks))
+    except KeyboardInterrupt:
+        stream.stop()
+        if latencies:
+            print(f"⏱️ 콜백 전달 지연 (프레임 수신->구독자, 거래소 체결 시각 기준 아님) "
+                  f"평균 {np.mean(latencies) * 1e6:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
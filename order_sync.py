@@ -0,0 +1,234 @@
+# order_sync.py
+"""
+주문/체결 내역 증분 동기화 (inquire-daily-ccld -> order_executions 테이블)
+
+orders 테이블은 우리가 낸 주문만 기록하므로, 실제 체결 수량/평균 체결가는 이 테이블에 따로 맞춰 둡니다.
+주문번호 역순으로 연속 조회(CTX_AREA_FK100/NK100)하면서, 지난 동기화 때 아직 끝나지 않았던
+가장 오래된 주문(하한선)까지만 읽고 멈추므로 조회 비용은 하루 전체가 아니라 그 사이 변경분에 비례합니다.
+새 주문이나 체결/취소 상태가 바뀐 행만 페이지 단위 트랜잭션으로 upsert 합니다.
+
+  python order_sync.py                      오늘 주문/체결 동기화 (trading_data.db)
+  python order_sync.py --since 20240102     지정 일자부터 (처음 한 번, 최대 3개월)
+  python order_sync.py --watch 30           30초마다 반복
+"""
+
+import argparse
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+
+import api
+
+DATABASE_PATH = "trading_data.db"
+KST = timezone(timedelta(hours=9))  # 주문일자는 한국 시간 기준
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_executions (
+    account TEXT NOT NULL,
+    order_date TEXT NOT NULL,          -- YYYYMMDD
+    order_no TEXT NOT NULL,
+    original_order_no TEXT,            -- 정정/취소 주문이면 원주문번호
+    stock_code TEXT NOT NULL,
+    stock_name TEXT,
+    order_type TEXT NOT NULL,          -- BUY, SELL
+    order_time TEXT,                   -- HHMMSS
+    quantity INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    filled_quantity INTEGER DEFAULT 0,
+    avg_fill_price REAL DEFAULT 0,
+    filled_amount INTEGER DEFAULT 0,
+    remaining_quantity INTEGER DEFAULT 0,
+    rejected_quantity INTEGER DEFAULT 0,
+    cancelled BOOLEAN DEFAULT FALSE,
+    state TEXT NOT NULL,               -- 체결/취소 상태 비교용 (변경된 행만 갱신)
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (account, order_date, order_no)
+);
+CREATE TABLE IF NOT EXISTS order_sync_state (
+    account TEXT PRIMARY KEY,
+    order_date TEXT NOT NULL,          -- 하한선 주문 일자
+    floor_order_no INTEGER NOT NULL,   -- 이 번호 미만 주문은 모두 끝나서 다시 읽지 않음
+    synced_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_executions_code_date ON order_executions(stock_code, order_date);
+"""
+
+UPSERT = """
+INSERT INTO order_executions (
+    account, order_date, order_no, original_order_no, stock_code, stock_name, order_type, order_time,
+    quantity, price, filled_quantity, avg_fill_price, filled_amount, remaining_quantity,
+    rejected_quantity, cancelled, state
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (account, order_date, order_no) DO UPDATE SET
+    filled_quantity = excluded.filled_quantity,
+    avg_fill_price = excluded.avg_fill_price,
+    filled_amount = excluded.filled_amount,
+    remaining_quantity = excluded.remaining_quantity,
+    rejected_quantity = excluded.rejected_quantity,
+    cancelled = excluded.cancelled,
+    state = excluded.state,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def iter_order_pages(account, start_date, end_date, code=""):
+    """체결/미체결 전체 주문을 주문번호 역순(최신 먼저)으로 페이지 단위 반환 (필요한 만큼만 요청)"""
+    params = {
+        "CANO": account[:8],
+        "ACNT_PRDT_CD": account[-2:],
+        "INQR_STRT_DT": start_date,
+        "INQR_END_DT": end_date,
+        "SLL_BUY_DVSN_CD": "00",  # 전체
+        "INQR_DVSN": "00",  # 역순
+        "PDNO": code,
+        "CCLD_DVSN": "00",  # 체결 + 미체결
+        "ORD_GNO_BRNO": "",
+        "ODNO": "",
+        "INQR_DVSN_3": "00",
+        "INQR_DVSN_1": "",
+        "CTX_AREA_FK100": "",
+        "CTX_AREA_NK100": ""
+    }
+    for data in api.iter_daily_ccld(params):
+        # 조회 결과가 없는 날은 빈 행 하나가 오기도 함
+        yield [row for row in data.get("output1", []) if row.get("odno")]
+
+
+def parse_row(account, row):
+    """API 행 -> order_executions 행 (UPSERT 컬럼 순서)"""
+    filled = int(row.get("tot_ccld_qty") or 0)
+    remaining = int(row.get("rmn_qty") or 0)
+    rejected = int(row.get("rjct_qty") or 0)
+    avg_price = float(row.get("avg_prvs") or 0)
+    cancelled = row.get("cncl_yn") == "Y"
+    state = f"{filled}|{remaining}|{rejected}|{avg_price:g}|{int(cancelled)}"
+    return (
+        account, row["ord_dt"], row["odno"], row.get("orgn_odno") or None,
+        row["pdno"], row.get("prdt_name"), "SELL" if row.get("sll_buy_dvsn_cd") == "01" else "BUY",
+        row.get("ord_tmd"), int(row.get("ord_qty") or 0), int(float(row.get("ord_unpr") or 0)),
+        filled, avg_price, int(row.get("tot_ccld_amt") or 0), remaining, rejected, cancelled, state,
+    )
+
+
+def is_final(record, today):
+    """더 이상 바뀌지 않는 주문 (잔량 없음, 취소, 또는 장 마감으로 소멸한 지난 영업일 주문)"""
+    return record[13] == 0 or record[15] or record[1] < today
+
+
+def ensure_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def load_state(conn, account):
+    row = conn.execute("SELECT order_date, floor_order_no FROM order_sync_state WHERE account = ?",
+                       (account,)).fetchone()
+    return (row[0], row[1]) if row else None
+
+
+def write_page(conn, records):
+    """한 페이지를 트랜잭션 하나로 기록하고 (신규, 변경) 건수 반환 (상태가 같은 행은 건너뜀)"""
+    existing = {}
+    for order_date in {record[1] for record in records}:
+        numbers = [record[2] for record in records if record[1] == order_date]
+        marks = ",".join("?" * len(numbers))
+        existing.update(((order_date, order_no), state) for order_no, state in conn.execute(
+            f"SELECT order_no, state FROM order_executions "
+            f"WHERE account = ? AND order_date = ? AND order_no IN ({marks})",
+            (records[0][0], order_date, *numbers)))
+    changed = [record for record in records if existing.get((record[1], record[2])) != record[-1]]
+    if changed:
+        with conn:
+            conn.executemany(UPSERT, changed)
+    inserted = sum(1 for record in changed if (record[1], record[2]) not in existing)
+    return inserted, len(changed) - inserted
+
+
+def sync_orders(conn, account=None, start_date=None, today=None):
+    """마지막 동기화 이후 새 주문/변경된 체결만 반영
+
+    하한선 (주문일자, 주문번호) 보다 오래된 주문은 지난번에 이미 끝난 것이므로 읽지 않고,
+    이번에 읽은 주문 중 아직 끝나지 않은 가장 오래된 주문을 새 하한선으로 저장합니다.
+    """
+    account = account or api.ACCOUNT
+    today = today or datetime.now(KST).strftime('%Y%m%d')
+    ensure_schema(conn)
+    state = load_state(conn, account)
+    if state is None or start_date:
+        floor = (start_date or today, 0)
+    else:
+        floor = state
+
+    result = {"pages": 0, "scanned": 0, "inserted": 0, "updated": 0, "floor": floor}
+    oldest_open = newest = None
+    pages = iter_order_pages(account, floor[0], today)
+    try:
+        for rows in pages:
+            result["pages"] += 1
+            records = []
+            reached_floor = False
+            for row in rows:
+                key = (row["ord_dt"], int(row["odno"]))
+                if key < floor:
+                    reached_floor = True
+                    break
+                record = parse_row(account, row)
+                records.append(record)
+                newest = max(newest or key, key)
+                if not is_final(record, today):
+                    oldest_open = min(oldest_open or key, key)
+            result["scanned"] += len(records)
+            if records:
+                inserted, updated = write_page(conn, records)
+                result["inserted"] += inserted
+                result["updated"] += updated
+            if reached_floor:
+                break
+    finally:
+        pages.close()  # 남은 페이지는 요청하지 않음
+
+    if oldest_open is not None:
+        floor = oldest_open
+    elif newest is not None:
+        floor = (newest[0], newest[1] + 1)
+    elif floor[0] < today and state is not None:
+        floor = (today, 0)  # 날짜가 바뀌었고 그 사이 주문이 없으면 오늘부터
+    with conn:
+        conn.execute(
+            "INSERT INTO order_sync_state (account, order_date, floor_order_no, synced_at) "
+            "VALUES (?, ?, ?, CURRENT_TIMESTAMP) ON CONFLICT (account) DO UPDATE SET "
+            "order_date = excluded.order_date, floor_order_no = excluded.floor_order_no, "
+            "synced_at = excluded.synced_at",
+            (account, floor[0], floor[1]))
+    result["floor"] = floor
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="주문/체결 내역 증분 동기화")
+    parser.add_argument("--db", default=DATABASE_PATH, help="SQLite DB 경로")
+    parser.add_argument("--account", default=None, help="계좌번호 (기본: ACCOUNT 환경변수)")
+    parser.add_argument("--since", default=None, help="YYYYMMDD 부터 다시 읽기 (하한선 무시)")
+    parser.add_argument("--watch", type=float, default=0, help="N초마다 반복 (0이면 한 번)")
+    args = parser.parse_args()
+
+    with closing(sqlite3.connect(args.db)) as conn:
+        start_date = args.since
+        while True:
+            started = time.perf_counter()
+            try:
+                result = sync_orders(conn, args.account, start_date=start_date)
+                start_date = None
+                print(f"🔄 {result['pages']}페이지 {result['scanned']}건 확인: "
+                      f"신규 {result['inserted']}건, 변경 {result['updated']}건 "
+                      f"(하한선 {result['floor'][0]} #{result['floor'][1]}, "
+                      f"{(time.perf_counter() - started) * 1000:.0f}ms)")
+            except Exception as e:
+                print(f"❌ 동기화 실패: {e}")
+            if not args.watch:
+                break
+            time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# portfolio.py
+"""
+여러 종목 포트폴리오 백테스트 (종목 x 시간 가격 행렬)
+
+  python portfolio.py 122640.json 005930.json --max-buy 1000000
+  python portfolio.py data/*.json --db trading_data.db   (종목별 max_buy_amount 사용)
+
+파일 이름(확장자 제외)을 종목코드로 사용합니다.
+"""
+
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+
+import bar_cache
+import indicator
+
+INITIAL_BALANCE = 1000 * 10000
+
+
+def load_matrix(filenames):
+    """분봉 JSON 파일들을 공통 시간축으로 정렬한 (종목코드, 시각, 가격 행렬) 반환
+
+    상장 전/데이터 시작 전은 NaN, 중간에 빠진 분봉은 직전 가격으로 채움
+    """
+    codes = []
+    series = []
+    for filename in filenames:
+        bars = bar_cache.load_bars(filename)
+        timestamps = bars["stck_bsop_date"].astype(np.int64) * 1000000 + bars["stck_cntg_hour"]
+        prices = bars["stck_prpr"].astype(np.float64)
+        order = np.argsort(timestamps, kind="stable")
+        series.append((timestamps[order], prices[order]))
+        codes.append(os.path.splitext(os.path.basename(filename))[0])
+
+    timestamps = np.unique(np.concatenate([item[0] for item in series])) if series else np.array([], np.int64)
+    matrix = np.full((len(series), len(timestamps)), np.nan)
+    for row, (ts, prices) in enumerate(series):
+        matrix[row, np.searchsorted(timestamps, ts)] = prices
+    forward_fill(matrix)
+    return codes, timestamps, matrix
+
+
+def forward_fill(matrix):
+    """행마다 NaN 을 직전 값으로 채우기 (제자리 변경)"""
+    valid = ~np.isnan(matrix)
+    index = np.where(valid, np.arange(matrix.shape[1]), 0)
+    np.maximum.accumulate(index, axis=1, out=index)
+    matrix[:] = np.take_along_axis(matrix, index, axis=1)
+    return matrix
+
+
+def crossover_events(prices, short_window=20, long_window=60, chunk_size=64):
+    """모든 종목의 골든/데드 크로스를 한 번에 계산해 (종목, 시점, 매수 여부) 배열로 반환
+
+    메모리를 제한하기 위해 종목을 chunk_size 행씩 나누어 계산
+    """
+    symbols, times, is_buy = [], [], []
+    for start in range(0, prices.shape[0], chunk_size):
+        block = prices[start:start + chunk_size]
+        valid = ~np.isnan(block)
+        prefix = indicator.prefix_sum(np.where(valid, block, 0))
+        valid_prefix = indicator.prefix_sum(valid.astype(np.int32))
+        ma_short = _masked_ma(block, short_window, prefix, valid_prefix)
+        ma_long = _masked_ma(block, long_window, prefix, valid_prefix)
+
+        diff = ma_short - ma_long
+        del ma_short, ma_long
+        prev = diff[:, :-1]
+        current = diff[:, 1:]
+        buy = (prev < 0) & (current >= 0)
+        sell = (prev >= 0) & (current < 0)
+        rows, cols = np.nonzero(buy | sell)
+        symbols.append(rows + start)
+        times.append(cols + 1)
+        is_buy.append(buy[rows, cols])
+
+    if not symbols:
+        return np.array([], np.int64), np.array([], np.int64), np.array([], bool)
+    return np.concatenate(symbols), np.concatenate(times), np.concatenate(is_buy)
+
+
+def _masked_ma(block, window_size, prefix, valid_prefix):
+    # 구간 안에 데이터가 없는 분봉이 있으면 NaN
+    ma = indicator.ma_array(block, window_size, prefix)
+    count = indicator.ma_array(block, window_size, valid_prefix) * window_size
+    ma[count < window_size] = np.nan
+    return ma
+
+
+def simulate(prices, events, initial_balance=INITIAL_BALANCE, max_buy_amount=None):
+    """공통 현금으로 신호를 시간 순서대로 체결
+
+    같은 시점에서는 매도를 먼저 처리해 현금을 확보한 뒤, 종목 순서대로
+    종목별 max_buy_amount(스칼라 또는 종목별 배열) 한도 안에서 매수.
+    현금이 모자라면 남은 현금으로 살 수 있는 만큼만 사고, 한 주도 못 사는 종목은 건너뛰고 다음 종목으로 넘어감.
+    반환: 이벤트별 체결 후 (보유수량, 종목별 누적 현금흐름), 최종 현금
+    """
+    n_symbols = prices.shape[0]
+    symbols, times, is_buy = events
+    if max_buy_amount is None:
+        max_buy_amount = initial_balance / max(n_symbols, 1)
+    max_buy = np.broadcast_to(np.asarray(max_buy_amount, dtype=np.float64), (n_symbols,))
+
+    # 시점, 매도 우선, 종목 순 정렬
+    order = np.lexsort((symbols, is_buy, times))
+    symbols, times, is_buy = symbols[order], times[order], is_buy[order]
+
+    cash = float(initial_balance)
+    quantity = np.zeros(n_symbols)
+    flow = np.zeros(n_symbols)
+    quantity_after = np.empty(len(symbols))
+    flow_after = np.empty(len(symbols))
+
+    starts = np.flatnonzero(np.r_[True, times[1:] != times[:-1]]) if len(times) else []
+    ends = np.r_[starts[1:], len(times)] if len(times) else []
+    for start, end in zip(starts, ends):
+        group = symbols[start:end]
+        buys = is_buy[start:end]
+        price = prices[group, times[start]]
+
+        sell = group[~buys]
+        proceeds = quantity[sell] * price[~buys]
+        cash += proceeds.sum()
+        flow[sell] += proceeds
+        quantity[sell] = 0
+
+        # 같은 시점 매수는 몇 건 되지 않으므로 남은 현금을 보며 차례로 체결
+        for symbol, buy_price in zip(group[buys].tolist(), price[buys].tolist()):
+            amount = min(max_buy[symbol], cash) // buy_price
+            cost = amount * buy_price
+            cash -= cost
+            quantity[symbol] += amount
+            flow[symbol] -= cost
+
+        quantity_after[start:end] = quantity[group]
+        flow_after[start:end] = flow[group]
+
+    return (symbols, times, is_buy, quantity_after, flow_after), cash
+
+
+def equity_curves(prices, ledger, initial_balance=INITIAL_BALANCE, chunk_size=64):
+    """종목별 손익 곡선(2차원)과 전체 평가금 곡선 계산 (float64, 원 단위 금액이 정확하도록)"""
+    symbols, times, _, quantity_after, flow_after = ledger
+    n_symbols, n_times = prices.shape
+    symbol_pnl = np.zeros((n_symbols, n_times))
+    total = np.full(n_times, float(initial_balance))
+    steps = np.arange(n_times)
+
+    order = np.argsort(symbols, kind="stable")  # 종목별로 모으되 시간 순서 유지
+    bounds = np.searchsorted(symbols[order], np.arange(n_symbols + 1))
+    for start in range(0, n_symbols, chunk_size):
+        rows = range(start, min(start + chunk_size, n_symbols))
+        block = np.zeros((len(rows), n_times))
+        for offset, row in enumerate(rows):
+            picked = order[bounds[row]:bounds[row + 1]]
+            if not len(picked):
+                continue
+            state = np.searchsorted(times[picked], steps, side="right")
+            held = np.r_[0, quantity_after[picked]][state]
+            flow = np.r_[0, flow_after[picked]][state]
+            block[offset] = flow + held * np.nan_to_num(prices[row])
+        symbol_pnl[start:start + len(rows)] = block
+        total += block.sum(axis=0)
+    return symbol_pnl, total
+
+
+def fill_counts(ledger, n_symbols):
+    """종목별 실제 체결 건수 (보유 수량이 바뀐 이벤트만 - 현금 부족으로 못 산 매수, 보유 없는 매도 제외)"""
+    symbols, _, _, quantity_after, _ = ledger
+    if not len(symbols):
+        return np.zeros(n_symbols, dtype=np.int64)
+    order = np.argsort(symbols, kind="stable")  # 종목별로 모으되 시간 순서 유지
+    symbols, after = symbols[order], quantity_after[order]
+    before = np.r_[0.0, after[:-1]]
+    before[np.r_[True, symbols[1:] != symbols[:-1]]] = 0  # 종목의 첫 이벤트 전에는 보유 없음
+    return np.bincount(symbols[after != before], minlength=n_symbols)
+
+
+def backtest_portfolio(prices, initial_balance=INITIAL_BALANCE, max_buy_amount=None,
+                       short_window=20, long_window=60):
+    """포트폴리오 백테스트 결과 (전체 평가금, 종목별 손익, 체결 내역)"""
+    events = crossover_events(prices, short_window, long_window)
+    ledger, cash = simulate(prices, events, initial_balance, max_buy_amount)
+    symbol_pnl, equity = equity_curves(prices, ledger, initial_balance)
+    interests = (equity / initial_balance - 1) * 100
+    drawdown = equity / np.maximum.accumulate(equity) - 1 if len(equity) else equity
+    return {
+        "equity": equity,
+        "interests": interests,
+        "max_drawdown": float(drawdown.min()) * 100 if len(drawdown) else 0.0,
+        "symbol_pnl": symbol_pnl,
+        "trades": fill_counts(ledger, prices.shape[0]),
+        "cash": cash,
+        "ledger": ledger,
+    }
+
+
+def load_max_buy_amounts(db_path, codes):
+    """trading_settings 의 종목별 max_buy_amount (설정이 없으면 NaN)"""
+    amounts = np.full(len(codes), np.nan)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT stock_code, max_buy_amount FROM trading_settings").fetchall()
+    settings = dict(rows)
+    for i, code in enumerate(codes):
+        if code in settings and settings[code] is not None:
+            amounts[i] = settings[code]
+    return amounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="여러 종목 이동평균 크로스 포트폴리오 백테스트")
+    parser.add_argument("files", nargs="+", help="종목별 분봉 JSON 파일")
+    parser.add_argument("--balance", type=int, default=INITIAL_BALANCE, help="초기 현금")
+    parser.add_argument("--max-buy", type=int, default=None, help="종목별 1회 최대 매수금액 (기본: 현금 / 종목 수)")
+    parser.add_argument("--db", help="trading_settings 의 종목별 max_buy_amount 사용")
+    parser.add_argument("--short", type=int, default=20, help="단기 이동평균 윈도우")
+    parser.add_argument("--long", type=int, default=60, help="장기 이동평균 윈도우")
+    args = parser.parse_args()
+
+    codes, timestamps, prices = load_matrix(args.files)
+    default_max_buy = args.max_buy if args.max_buy else args.balance / max(len(codes), 1)
+    max_buy = np.full(len(codes), float(default_max_buy))
+    if args.db:
+        from_db = load_max_buy_amounts(args.db, codes)
+        max_buy = np.where(np.isnan(from_db), max_buy, from_db)
+
+    result = backtest_portfolio(prices, args.balance, max_buy, args.short, args.long)
+
+    print(f"📊 종목 {len(codes)}개, 분봉 {len(timestamps)}개")
+    print(f"{'종목':<10} {'거래':>5} {'손익(원)':>14}")
+    final_pnl = result["symbol_pnl"][:, -1] if len(timestamps) else np.zeros(len(codes))
+    for code, trades, pnl in zip(codes, result["trades"], final_pnl):
+        print(f"{code:<10} {trades:>5} {pnl:>14,.0f}")
+    if len(timestamps):
+        print(f"💰 최종 평가금: {result['equity'][-1]:,.0f}원 "
+              f"(수익률 {result['interests'][-1]:.2f}%, MDD {result['max_drawdown']:.2f}%)")
+
+
+if __name__ == "__main__":
+    main()
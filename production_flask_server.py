@@ -6,10 +6,12 @@
 
 import os
 import secrets
-from flask import Flask, request, jsonify, session, render_template_string
+from flask import Flask, request, jsonify, session, render_template_string, g
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 import api
+import indicator_cache
+import quote_cache
 from database import TradingDatabase
 from datetime import datetime, timedelta
 import json
@@ -48,6 +50,14 @@ logger = logging.getLogger(__name__)
 # 데이터베이스 초기화
 db = TradingDatabase(app.config['DATABASE_PATH'])
 
+def save_quote(code, price):
+    """증권사에서 새 가격을 받아왔을 때만 기록 (캐시 적중시에는 기록 안 함)"""
+    db.save_price_data(code, price)
+    db.log_info(f"가격 조회: {code} - {price:,}원")
+
+# 같은 종목 동시 조회는 증권사 요청 한 번으로 합침
+quotes = quote_cache.QuoteCache(on_refresh=save_quote)
+
 # 인증 관리
 class AuthManager:
     def __init__(self):
@@ -143,12 +153,11 @@ def require_trading_token(f):
     """거래 토큰 필요 데코레이터"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Trading-Token') or request.json.get('token') if request.json else request.args.get('token')
-        
-        if not token:
-            return jsonify({'error': '거래 토큰이 필요합니다'}), 400
+        data = request.get_json(silent=True) or {}
+        token = request.headers.get('Trading-Token') or data.get('token') or request.args.get('token')
         
-        api.ACCESS_TOKEN = token
+        # 토큰을 보내지 않으면 token_manager 가 워커들과 공유하는 토큰 사용 (요청마다 따로 전달)
+        g.trading_token = token or None
         return f(*args, **kwargs)
     
     return decorated_function
@@ -307,10 +316,8 @@ def api_get_price():
         return jsonify({'error': '종목코드가 필요합니다'}), 400
 
     try:
-        price = api.fetch_current_price(code)
+        price = quotes.get(code, token=g.trading_token)
         if price is not None:
-            db.save_price_data(code, price)
-            db.log_info(f"가격 조회: {code} - {price:,}원 (사용자: {request.current_user})")
             return jsonify({'price': price})
         else:
             return jsonify({'error': '가격 조회 실패'}), 500
@@ -338,7 +345,8 @@ def api_make_order():
         
         success = api.order(
             data['type'], data['account'], 
-            data['code'], data['amount'], data['price']
+            data['code'], data['amount'], data['price'],
+            token=g.trading_token
         )
         
         status = 'SUCCESS' if success else 'FAILED'
@@ -368,10 +376,10 @@ def api_dashboard():
         if recent_prices:
             current_price = recent_prices[0]
         
-        # 최근 이동평균
-        ma_data = db.get_latest_moving_averages(code, 1)
-        ma20 = ma_data[0]['ma20'] if ma_data else None
-        ma60 = ma_data[0]['ma60'] if ma_data else None
+        # 최근 이동평균 (캐시된 값에 매매 루프의 새 봉만 반영)
+        load_bars = indicator_cache.price_bar_loader(app.config['DATABASE_PATH'], code)
+        ma20 = indicator_cache.cache.get(code, "floor_ma", (20,), load_bars)
+        ma60 = indicator_cache.cache.get(code, "floor_ma", (60,), load_bars)
         
         # 통계
         today_stats = db.get_statistics(code, 1)
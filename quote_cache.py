@@ -0,0 +1,169 @@
+# quote_cache.py
+"""
+현재가 캐시 (종목별 TTL + single-flight + stale-while-revalidate)
+
+여러 화면이 같은 종목을 동시에 조회해도 증권사 요청은 한 번만 나가도록 api.fetch_current_price 앞에 둡니다.
+
+- TTL 이내: 캐시된 가격 반환
+- TTL 이 지났지만 stale 허용 시간 이내: 캐시된 가격을 바로 반환하고 백그라운드에서 한 번만 갱신
+- 그보다 오래됐거나 없음: 같은 종목의 동시 요청은 하나의 조회 결과를 함께 기다림
+- on_refresh(code, price) 는 실제로 새 가격을 받아올 때만 호출 (DB 기록은 갱신당 한 번)
+- get_many 는 캐시에 없는 종목만 모아 fetch_many(codes) 로 한 번에 조회 (없으면 종목별 fetch 를 병렬로)
+
+    quotes = QuoteCache(on_refresh=lambda code, price: db.save_price_data(code, price))
+    price = quotes.get("122640")
+    prices = quotes.get_many(["122640", "005930"])
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import api
+
+# 기본 TTL 과 TTL 이후 stale 값을 내줄 수 있는 시간 (초)
+QUOTE_TTL = float(os.environ.get("KIS_QUOTE_TTL", 1.0))
+QUOTE_STALE = float(os.environ.get("KIS_QUOTE_STALE", 5.0))
+
+
+class _Entry:
+    __slots__ = ("price", "fetched_at", "flight", "result")
+
+    def __init__(self):
+        self.price = None       # 마지막으로 성공한 가격
+        self.fetched_at = 0.0   # 그 시각 (time.monotonic)
+        self.flight = None      # 진행 중인 조회가 끝나면 set 되는 Event
+        self.result = None      # 가장 최근 조회 결과 (실패면 None)
+
+
+class QuoteCache:
+    def __init__(self, fetch=None, ttl=QUOTE_TTL, stale=QUOTE_STALE, ttls=None, on_refresh=None,
+                 wait_timeout=15.0, max_workers=4, fetch_many=None):
+        self.fetch = fetch
+        self.fetch_many = fetch_many  # codes -> {종목코드: 가격}
+        self.ttl = ttl
+        self.stale = stale
+        self.ttls = dict(ttls or {})  # 종목코드 -> TTL
+        self.on_refresh = on_refresh
+        self.wait_timeout = wait_timeout
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quote-refresh")
+        self.counts = {"hit": 0, "stale": 0, "miss": 0, "wait": 0, "upstream": 0, "failed": 0}
+
+    def set_ttl(self, code, ttl):
+        self.ttls[code] = ttl
+
+    def get(self, code, token=None):
+        """현재가 (조회 실패이고 내줄 수 있는 캐시 값도 없으면 None)
+
+        token 은 증권사에 실제로 조회할 때만 쓰임 (시세는 공개 정보라 토큰과 관계없이 캐시를 공유)
+        """
+        with self.lock:
+            price, entry, flight = self._claim(code, token)
+        if entry is None:
+            return price
+        if flight is None:
+            return self._refresh(code, entry, token)
+        if not flight.wait(self.wait_timeout):
+            return None
+        return entry.result
+
+    def get_many(self, codes, token=None):
+        """여러 종목 현재가 {종목코드: 가격} (캐시에 없는 종목만 한 번에 조회)"""
+        codes = list(dict.fromkeys(codes))
+        prices, leaders, waiting = {}, {}, {}
+        with self.lock:
+            for code in codes:
+                price, entry, flight = self._claim(code, token)
+                if entry is None:
+                    prices[code] = price
+                elif flight is None:
+                    leaders[code] = entry
+                else:
+                    waiting[code] = (entry, flight)
+        if leaders:
+            fetched = self._fetch_many(list(leaders), token)
+            for code, entry in leaders.items():
+                prices[code] = self._complete(code, entry, fetched.get(code))
+        for code, (entry, flight) in waiting.items():
+            prices[code] = entry.result if flight.wait(self.wait_timeout) else None
+        return {code: prices[code] for code in codes}
+
+    def _claim(self, code, token):
+        """(캐시 가격, None, None) 또는 조회가 필요하면 (None, 항목, 기다릴 Event - 직접 조회할 차례면 None)
+
+        self.lock 을 잡은 상태에서 호출
+        """
+        entry = self.entries.get(code)
+        if entry is None:
+            entry = self.entries[code] = _Entry()
+        ttl = self.ttls.get(code, self.ttl)
+        age = time.monotonic() - entry.fetched_at
+        if entry.price is not None and age < ttl:
+            self.counts["hit"] += 1
+            return entry.price, None, None
+        if entry.price is not None and age < ttl + self.stale:
+            self.counts["stale"] += 1
+            if entry.flight is None:
+                entry.flight = threading.Event()
+                self.executor.submit(self._refresh, code, entry, token)
+            return entry.price, None, None
+        if entry.flight is None:
+            entry.flight = threading.Event()
+            self.counts["miss"] += 1
+            return None, entry, None
+        self.counts["wait"] += 1
+        return None, entry, entry.flight
+
+    def _fetch(self, code, token=None):
+        fetch = self.fetch or api.fetch_current_price
+        try:
+            return fetch(code, token=token) if token else fetch(code)
+        except Exception as e:
+            print(f"❌ 현재가 조회 실패 {code}: {e}")
+            return None
+
+    def _fetch_many(self, codes, token=None):
+        if self.fetch_many is None:
+            return dict(zip(codes, self.executor.map(lambda code: self._fetch(code, token), codes)))
+        try:
+            return self.fetch_many(codes, token=token) if token else self.fetch_many(codes)
+        except Exception as e:
+            print(f"❌ 현재가 일괄 조회 실패 {','.join(codes)}: {e}")
+            return {}
+
+    def _refresh(self, code, entry, token=None):
+        return self._complete(code, entry, self._fetch(code, token))
+
+    def _complete(self, code, entry, price):
+        """조회 결과를 반영하고 기다리던 요청을 깨움"""
+        with self.lock:
+            self.counts["upstream"] += 1
+            if price is None:
+                self.counts["failed"] += 1
+            else:
+                entry.price, entry.fetched_at = price, time.monotonic()
+            entry.result = price
+            flight, entry.flight = entry.flight, None
+        flight.set()
+        if price is not None and self.on_refresh is not None:
+            try:
+                self.on_refresh(code, price)
+            except Exception as e:
+                print(f"❌ 현재가 기록 실패 {code}: {e}")
+        return price
+
+    def invalidate(self, code=None):
+        with self.lock:
+            for key in ([code] if code else list(self.entries)):
+                entry = self.entries.get(key)
+                if entry is not None:
+                    entry.fetched_at = 0.0  # 진행 중인 조회는 그대로 두고 다음 요청부터 새로 조회
+
+    def stats(self):
+        with self.lock:
+            total = self.counts["hit"] + self.counts["stale"] + self.counts["miss"] + self.counts["wait"]
+            return dict(self.counts, symbols=len(self.entries), ttl=self.ttl, stale_ttl=self.stale,
+                        hit_ratio=(total - self.counts["miss"]) / total if total else 0.0)
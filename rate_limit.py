@@ -0,0 +1,197 @@
+# rate_limit.py
+"""
+KIS 요청 속도 제한 스케줄러
+
+앱키 전체에 대한 토큰 버킷 하나와 (선택) tr_id 별 토큰 버킷으로 초당 요청 수를 맞추고,
+대기 중인 요청은 우선순위 순서로 내보냅니다. 주문/취소가 시세/잔고 조회보다 먼저 나갑니다.
+동기(acquire)와 비동기(acquire_async) 요청은 같은 대기열에서 순서를 기다립니다.
+
+    limiter.acquire("TTTC0012U")   # 토큰을 받을 때까지 대기 후 요청 전송
+    limiter.stats()                # 우선순위별 대기 시간 통계
+
+제한은 프로세스 단위입니다. KIS 는 앱키 단위로 제한하므로 기본값은 같은 앱키를 쓰는 두 프로세스
+(updated_main.py 와 Flask 서버)가 함께 돌아도 초당 20건을 넘지 않게 잡았습니다.
+버킷은 토큰 1개로 시작하므로 어느 1초 구간에서도 초당 건수 + 1 건까지만 나갑니다.
+프로세스가 더 많으면 KIS_RATE_LIMIT 을 그만큼 낮춰 설정합니다.
+
+    KIS_RATE_LIMIT=5 KIS_TR_LIMITS=FHKST01010100:3,TTTC8434R:2 python updated_main.py
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+# 우선순위 (작을수록 먼저)
+ORDER, QUERY = 0, 1
+LANE_NAMES = {ORDER: "order", QUERY: "query"}
+
+# 주문/정정취소 tr_id (실전: TTTC, 모의: VTTC)
+ORDER_TR_IDS = {"TTTC0012U", "TTTC0011U", "TTTC0013U", "VTTC0012U", "VTTC0011U", "VTTC0013U"}
+
+# 프로세스당 초당 요청 수 (실전 앱키당 20건 - 두 프로세스 x (8 + 1) = 18건, 모의 2건은 KIS_RATE_LIMIT 으로)
+DEFAULT_RATE = float(os.environ.get("KIS_RATE_LIMIT", 8))
+
+
+def parse_tr_limits(text):
+    """"tr_id:초당건수,..." -> {tr_id: 초당건수}"""
+    limits = {}
+    for item in (text or "").split(","):
+        if item.strip():
+            tr_id, limit = item.split(":")
+            limits[tr_id.strip()] = float(limit)
+    return limits
+
+
+# tr_id 별 초당 요청 수 (앱키 전체 제한과 함께 적용)
+DEFAULT_TR_LIMITS = parse_tr_limits(os.environ.get("KIS_TR_LIMITS"))
+
+
+def lane_of(tr_id):
+    return ORDER if tr_id in ORDER_TR_IDS else QUERY
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity  # 한 번에 몰아서 보낼 수 있는 건수 (1초 구간 최대 = rate + capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """토큰 하나가 생길 때까지 남은 시간 (refill 직후 호출)"""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, rate=DEFAULT_RATE, tr_limits=None, history=1000):
+        self.bucket = TokenBucket(rate)
+        self.tr_buckets = {tr_id: TokenBucket(limit) for tr_id, limit in (tr_limits or {}).items()}
+        self.condition = threading.Condition()
+        self.waiting = []  # (우선순위, 순번, 깨우기) - 깨우기는 비동기 요청만 (동기 요청은 condition)
+        self.sequence = itertools.count()
+        self.requests = {lane: 0 for lane in LANE_NAMES}
+        self.total_wait = {lane: 0.0 for lane in LANE_NAMES}
+        self.recent_waits = {lane: deque(maxlen=history) for lane in LANE_NAMES}
+
+    def set_tr_limit(self, tr_id, limit):
+        """tr_id 별 초당 요청 수 설정 (None 이면 해제)"""
+        with self.condition:
+            if limit is None:
+                self.tr_buckets.pop(tr_id, None)
+            else:
+                self.tr_buckets[tr_id] = TokenBucket(limit)
+            self.condition.notify_all()
+
+    def _buckets(self, tr_id):
+        bucket = self.tr_buckets.get(tr_id)
+        return (self.bucket,) if bucket is None else (self.bucket, bucket)
+
+    def _try_take(self, tr_id, now):
+        """토큰이 있으면 차감하고 0, 없으면 기다려야 할 시간 반환 (condition 잠금 상태에서 호출)"""
+        buckets = self._buckets(tr_id)
+        for bucket in buckets:
+            bucket.refill(now)
+        wait = max(bucket.wait_time() for bucket in buckets)
+        if wait == 0:
+            for bucket in buckets:
+                bucket.tokens -= 1
+        return wait
+
+    def _leave(self, entry):
+        """대기열에서 빼고 다음 순서 요청을 깨움 (condition 잠금 상태에서 호출)"""
+        self.waiting.remove(entry)
+        heapq.heapify(self.waiting)
+        self.condition.notify_all()
+        if self.waiting and self.waiting[0][2] is not None:
+            self.waiting[0][2]()
+
+    def _record(self, lane, waited):
+        self.requests[lane] += 1
+        self.total_wait[lane] += waited
+        self.recent_waits[lane].append(waited)
+
+    def acquire(self, tr_id):
+        """토큰을 받을 때까지 대기 (앞에 더 높은 우선순위 요청이 있으면 그 뒤에 나감)"""
+        lane = lane_of(tr_id)
+        entry = (lane, next(self.sequence), None)
+        start = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    if self.waiting[0] is entry:
+                        wait = self._try_take(tr_id, time.monotonic())
+                        if wait == 0:
+                            break
+                        self.condition.wait(wait)
+                    else:
+                        self.condition.wait()
+            finally:
+                self._leave(entry)
+            self._record(lane, time.monotonic() - start)
+
+    async def acquire_async(self, tr_id):
+        """이벤트 루프를 막지 않는 acquire (동기 요청과 같은 대기열에서 우선순위 순서대로 나감)"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def wake():
+            # 다른 스레드(동기 요청)에서도 호출되므로 이벤트 루프에 넘겨서 set
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # 이미 닫힌 루프
+
+        lane = lane_of(tr_id)
+        entry = (lane, next(self.sequence), wake)
+        start = time.monotonic()
+        with self.condition:
+            heapq.heappush(self.waiting, entry)
+        try:
+            while True:
+                with self.condition:
+                    wait = None  # 차례가 아니면 앞 요청이 나갈 때 깨워줌
+                    if self.waiting[0] is entry:
+                        wait = self._try_take(tr_id, time.monotonic())
+                        if wait == 0:
+                            break
+                    event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self.condition:
+                self._leave(entry)
+        with self.condition:
+            self._record(lane, time.monotonic() - start)
+
+    def stats(self):
+        """우선순위별 요청 수와 대기 시간(ms) 통계"""
+        with self.condition:
+            result = {}
+            for lane, name in LANE_NAMES.items():
+                recent = sorted(self.recent_waits[lane])
+                count = self.requests[lane]
+                result[name] = {
+                    "requests": count,
+                    "waiting": sum(1 for entry in self.waiting if entry[0] == lane),
+                    "mean_wait_ms": self.total_wait[lane] / count * 1000 if count else 0.0,
+                    "p95_wait_ms": recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000 if recent else 0.0,
+                    "max_wait_ms": recent[-1] * 1000 if recent else 0.0,
+                }
+            return result
+
+
+# 프로세스 공용 스케줄러 (api.py, async_api.py 가 모든 요청 전에 사용)
+limiter = RateLimiter(tr_limits=DEFAULT_TR_LIMITS)
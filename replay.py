@@ -0,0 +1,313 @@
+# replay.py
+"""
+자동매매 루프 가속 리플레이 (가상 시계 + 가짜 증권사)
+
+updated_main.main_trading_loop 를 코드 수정 없이 기록된 가격으로 돌립니다.
+모듈의 api, sleep, db 만 바꿔 끼우므로 실제 루프 로직이 그대로 실행되고,
+sleep(60) 은 가상 시계만 앞으로 돌려 CPU가 허용하는 만큼 빠르게 진행됩니다.
+
+  python replay.py sample.json
+  python replay.py trading_data.db --code 122640 --verbose
+  python replay.py --check                  골든크로스 합성 가격으로 매수 경로 점검
+
+사이클 지연 시간 분포와 DB 메서드별 호출 수/소요 시간을 출력합니다.
+루프가 남기는 기록은 임시 DB 에 저장됩니다 (--keep-db 로 보존, --db 로 경로 지정).
+"""
+
+import argparse
+import contextlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import closing
+
+import numpy as np
+
+import bar_cache
+
+# updated_main 은 import 시점에 API 키 환경변수를 읽으므로 리플레이용 값을 먼저 넣어둠
+for _name in ("APPKEY", "APPSECRET", "ACCOUNT", "ACCESS_TOKEN"):
+    os.environ.setdefault(_name, "REPLAY00000000")
+
+import updated_main  # noqa: E402
+
+INITIAL_CASH = 1000 * 10000
+WRITE_PREFIXES = ("save_", "update_", "log_")
+
+
+class ReplayFinished(BaseException):
+    """기록된 가격을 모두 사용함 (루프의 except Exception 에 잡히지 않도록 BaseException)"""
+
+
+class VirtualClock:
+    """sleep 을 가상 시간 진행으로 바꾸고, sleep 사이의 실제 경과 시간을 사이클 지연으로 기록"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.latencies = []
+        self.last = time.perf_counter()
+
+    def sleep(self, seconds):
+        current = time.perf_counter()
+        self.latencies.append(current - self.last)
+        self.now += seconds
+        self.last = current
+
+    def time(self):
+        return self.now
+
+
+class FakeBroker:
+    """api 모듈 대용: 기록된 가격을 순서대로 내주고 지정가 주문을 다음 가격에서 체결
+
+    반환 타입은 api 모듈과 같게 맞춤 (수량/금액은 int, clear_orders 는 결과 dict)
+    """
+
+    def __init__(self, prices, initial_cash=INITIAL_CASH):
+        self.prices = prices
+        self.index = 0
+        self.last_price = None
+        self.cash = initial_cash
+        self.quantity = 0
+        self.open_orders = {}  # 주문번호 -> [매수/매도, 수량, 지정가]
+        self.next_order_no = 1
+        self.calls = Counter()
+        self.orders = Counter()  # 접수된 주문 수 (매수/매도별)
+        self.fills = 0
+        self.cancels = 0
+
+    def prewarm(self, connections=None):
+        return 0
+
+    def fetch_current_price(self, code, token=None):
+        self.calls["fetch_current_price"] += 1
+        if self.index >= len(self.prices):
+            raise ReplayFinished
+        price = self.prices[self.index]
+        self.index += 1
+        self.last_price = price
+        self._match(price)
+        return price
+
+    def _match(self, price):
+        for order_no, (side, quantity, limit) in list(self.open_orders.items()):
+            if side == "BUY" and price <= limit:
+                self.cash -= quantity * limit
+                self.quantity += quantity
+            elif side == "SELL" and price >= limit:
+                self.cash += quantity * limit
+                self.quantity -= quantity
+            else:
+                continue
+            del self.open_orders[order_no]
+            self.fills += 1
+
+    def fetch_orders(self, account, code, token=None):
+        self.calls["fetch_orders"] += 1
+        return [{"odno": order_no, "pdno": code, "sll_buy_dvsn_cd": "02" if side == "BUY" else "01",
+                 "ord_qty": str(quantity), "ord_unpr": str(limit), "rmn_qty": str(quantity)}
+                for order_no, (side, quantity, limit) in self.open_orders.items()]
+
+    def cancel_order(self, account, order_no, token=None):
+        self.calls["cancel_order"] += 1
+        if self.open_orders.pop(order_no, None) is None:
+            return False
+        self.cancels += 1
+        return True
+
+    def clear_orders(self, account, code, force=False, token=None):
+        result = {"queried": True, "cancelled": [], "failed": [], "error": None}
+        for order in self.fetch_orders(account, code):
+            success = self.cancel_order(account, order["odno"])
+            result["cancelled" if success else "failed"].append(order["odno"])
+        return result
+
+    def _reserved(self):
+        return sum(quantity * limit for side, quantity, limit in self.open_orders.values() if side == "BUY")
+
+    def fetch_avail(self, account, code, target_price, token=None):
+        self.calls["fetch_avail"] += 1
+        return int((self.cash - self._reserved()) // target_price)
+
+    def fetch_quantity(self, account, code, token=None):
+        self.calls["fetch_quantity"] += 1
+        return int(self.quantity)
+
+    def fetch_eval(self, account, token=None):
+        self.calls["fetch_eval"] += 1
+        return int(self.cash + self.quantity * (self.last_price or 0))
+
+    def order(self, order_type, account, code, amount, target_price, token=None):
+        self.calls["order"] += 1
+        if order_type == "BUY" and amount * target_price > self.cash - self._reserved():
+            return False
+        if order_type == "SELL" and amount > self.quantity:
+            return False
+        self.open_orders[f"{self.next_order_no:010d}"] = [order_type, amount, target_price]
+        self.next_order_no += 1
+        self.orders[order_type] += 1
+        return True
+
+
+class CountingDatabase:
+    """TradingDatabase 호출을 그대로 넘기면서 메서드별 호출 수와 소요 시간 기록"""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = Counter()
+        self.seconds = defaultdict(float)
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self.calls[name] += 1
+                self.seconds[name] += time.perf_counter() - start
+
+        self.__dict__[name] = call  # 다음 호출부터는 __getattr__ 를 거치지 않음
+        return call
+
+    def writes(self):
+        return sum(count for name, count in self.calls.items() if name.startswith(WRITE_PREFIXES))
+
+
+def load_recorded_prices(source, code):
+    """trading_data.db 의 price_data 또는 분봉 JSON 에서 가격 목록 읽기"""
+    if source.endswith(".db"):
+        with closing(sqlite3.connect(source)) as conn:
+            rows = conn.execute("SELECT price FROM price_data WHERE stock_code = ? ORDER BY id", (code,))
+            return [price for (price,) in rows]
+    return bar_cache.load_bars(source)["stck_prpr"].tolist()
+
+
+def replay(prices, db, initial_cash=INITIAL_CASH, verbose=False):
+    """updated_main 의 api/sleep/db 를 바꿔 끼우고 메인 루프를 끝까지 실행"""
+    clock = VirtualClock()
+    broker = FakeBroker(prices, initial_cash)
+    counting_db = CountingDatabase(db)
+
+    original = (updated_main.api, updated_main.sleep, updated_main.db)
+    updated_main.api, updated_main.sleep, updated_main.db = broker, clock.sleep, counting_db
+    start = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            if not verbose:
+                devnull = stack.enter_context(open(os.devnull, "w"))  # 루프가 끝나면 닫힘
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            updated_main.main_trading_loop()
+    except ReplayFinished:
+        pass
+    finally:
+        elapsed = time.perf_counter() - start
+        updated_main.api, updated_main.sleep, updated_main.db = original
+
+    return {
+        "cycles": len(clock.latencies),
+        "elapsed": elapsed,
+        "virtual_seconds": clock.now,
+        "latencies": np.asarray(clock.latencies),
+        "db_calls": dict(counting_db.calls),
+        "db_seconds": dict(counting_db.seconds),
+        "db_writes": counting_db.writes(),
+        "broker_calls": dict(broker.calls),
+        "orders": dict(broker.orders),
+        "fills": broker.fills,
+        "cancels": broker.cancels,
+        "final_eval": broker.fetch_eval(None),
+        "initial_cash": initial_cash,
+    }
+
+
+def print_report(report):
+    cycles = report["cycles"]
+    print(f"🔁 사이클 {cycles:,}회, 실제 {report['elapsed']:.2f}초 "
+          f"({cycles / report['elapsed']:,.0f} 사이클/초), 가상 {report['virtual_seconds'] / 3600:.1f}시간")
+    if cycles:
+        latencies = report["latencies"] * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"⏱️  사이클 지연: p50 {p50:.3f}ms, p95 {p95:.3f}ms, p99 {p99:.3f}ms, 최대 {latencies.max():.3f}ms")
+        print(f"💾 DB 쓰기 {report['db_writes']:,}회 (사이클당 {report['db_writes'] / cycles:.1f}회)")
+
+    print(f"{'DB 메서드':<28} {'호출':>8} {'합계(ms)':>10} {'평균(ms)':>9}")
+    for name, count in sorted(report["db_calls"].items(), key=lambda item: -report["db_seconds"][item[0]]):
+        total = report["db_seconds"][name] * 1000
+        print(f"{name:<28} {count:>8,} {total:>10.1f} {total / count:>9.3f}")
+
+    roi = (report["final_eval"] / report["initial_cash"] - 1) * 100
+    print(f"📝 체결 {report['fills']}건, 취소 {report['cancels']}건, 최종 평가금 {report['final_eval']:,}원 ({roi:.2f}%)")
+
+
+def golden_cross_prices(start=20000, tick=10):
+    """MA20 이 MA60 을 아래에서 위로 한 번 뚫는 합성 가격 (하락 80봉 후 상승 40봉)"""
+    falling = [start - tick * i for i in range(80)]
+    return falling + [falling[-1] + tick * 5 * i for i in range(1, 41)]
+
+
+def check_buy(db):
+    """골든크로스 가격으로 루프를 돌려 매수 주문까지 가는지 점검 (문제 목록 반환, 비어 있으면 통과)
+
+    루프는 사이클 안의 예외를 잡아 로그만 남기므로, 오류 로그가 없고 매수 주문이 실제로 나갔는지 확인
+    """
+    report = replay(golden_cross_prices(), db)
+    problems = []
+    if not report["broker_calls"].get("fetch_avail"):
+        problems.append("매수 신호가 나오지 않음 (fetch_avail 호출 없음)")
+    if not report["orders"].get("BUY"):
+        problems.append("매수 주문이 나가지 않음")
+    if report["db_calls"].get("log_error"):
+        problems.append(f"루프 오류 로그 {report['db_calls']['log_error']}건")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="updated_main 자동매매 루프 가속 리플레이")
+    parser.add_argument("source", nargs="?", default="sample.json", help="분봉 JSON 또는 trading_data.db")
+    parser.add_argument("--code", default=updated_main.CODE, help="price_data 에서 읽을 종목코드")
+    parser.add_argument("--cash", type=int, default=INITIAL_CASH, help="가짜 계좌 초기 현금")
+    parser.add_argument("--db", help="리플레이 기록 DB 경로 (기본: 임시 파일)")
+    parser.add_argument("--keep-db", action="store_true", help="임시 리플레이 DB 를 지우지 않음")
+    parser.add_argument("--verbose", action="store_true", help="루프 출력 표시")
+    parser.add_argument("--check", action="store_true", help="합성 골든크로스로 매수 경로 점검 (source 무시)")
+    args = parser.parse_args()
+
+    prices = None if args.check else load_recorded_prices(args.source, args.code)
+    if not args.check and not prices:
+        print(f"❌ {args.source}: 가격 데이터가 없습니다")
+        return
+
+    # 임시 DB 는 가능하면 메모리 파일시스템에 두어 디스크 동기화가 사이클 시간을 가리지 않게 함
+    temp_root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="replay-", dir=temp_root), "replay.db")
+    db = updated_main.TradingDatabase(db_path)
+    try:
+        if args.check:
+            problems = check_buy(db)
+        else:
+            report = replay(prices, db, args.cash, args.verbose)
+    finally:
+        db.close()
+        if not args.db and not args.keep_db:
+            shutil.rmtree(os.path.dirname(db_path), ignore_errors=True)
+    if args.check:
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            raise SystemExit(1)
+        print("✅ 매수 경로 점검 통과")
+        return
+    print_report(report)
+    if args.keep_db or args.db:
+        print(f"📂 리플레이 DB: {db_path}")
+
+
+if __name__ == "__main__":
+    main()
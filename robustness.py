@@ -0,0 +1,198 @@
+# robustness.py
+"""
+이동평균 크로스 전략 강건성 분석 (몬테카를로 / 블록 부트스트랩)
+
+원본 분봉의 수익률을 블록 단위로 다시 뽑아 만든 가격 경로 수천 개에 대해 백테스트를 돌리고
+수익률(ROI)과 최대 낙폭(MDD)의 분포를 봅니다. --jitter 를 주면 경로마다 이동평균 윈도우도
+무작위로 흔들어서 파라미터에 얼마나 민감한지 함께 확인합니다.
+
+  python robustness.py sample.json --paths 1000
+  python robustness.py minute.json --paths 10000 --bars 95000 --block 60 --jitter 0.2
+
+경로는 배치(2차원 배열) 단위로 생성/계산하고 배치들을 프로세스 풀에 나누어 실행합니다.
+"""
+
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import backtest
+import indicator
+
+INITIAL_BALANCE = 1000 * 10000
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def log_returns(prices):
+    prices = np.asarray(prices, dtype=float)
+    return np.diff(np.log(prices))
+
+
+def bootstrap_paths(rng, returns, start_price, count, length, block_size):
+    """수익률을 block_size 길이 블록으로 이어 붙인 (count, length) 정수 가격 경로"""
+    steps = length - 1
+    block_size = max(1, min(block_size, len(returns)))
+    blocks = -(-steps // block_size)
+    starts = rng.integers(0, len(returns) - block_size + 1, size=(count, blocks))
+    index = (starts[:, :, None] + np.arange(block_size)).reshape(count, -1)[:, :steps]
+
+    log_path = np.empty((count, length))
+    log_path[:, 0] = np.log(start_price)
+    np.cumsum(returns[index], axis=1, out=log_path[:, 1:])
+    log_path[:, 1:] += log_path[:, :1]
+    return np.maximum(np.rint(np.exp(log_path)), 1).astype(np.int64)
+
+
+def jitter_windows(rng, count, short_window, long_window, jitter):
+    """경로별 (단기, 장기) 윈도우 (jitter 비율만큼 균등 분포로 흔들기, 장기 > 단기 유지)"""
+    if jitter <= 0:
+        return np.full(count, short_window), np.full(count, long_window)
+    short = np.rint(short_window * rng.uniform(1 - jitter, 1 + jitter, count)).astype(int)
+    long = np.rint(long_window * rng.uniform(1 - jitter, 1 + jitter, count)).astype(int)
+    short = np.maximum(short, 2)
+    return short, np.maximum(long, short + 1)
+
+
+def batch_ma(paths, prefix, windows):
+    """행마다 다른 윈도우의 이동평균 (같은 윈도우끼리 묶어서 누적합으로 계산)"""
+    result = np.empty(paths.shape)
+    for window in np.unique(windows):
+        rows = windows == window
+        result[rows] = indicator.ma_array(paths[rows], int(window), prefix[rows])
+    return result
+
+
+def evaluate_batch(paths, short, long, initial_balance=INITIAL_BALANCE):
+    """경로 배치 백테스트 -> (수익률, 최대 낙폭, 거래 수) 배열"""
+    prefix = indicator.prefix_sum(paths)
+    ma_short = batch_ma(paths, prefix, short)
+    ma_long = batch_ma(paths, prefix, long)
+    del prefix
+
+    count = len(paths)
+    roi = np.empty(count)
+    max_drawdown = np.empty(count)
+    trades = np.empty(count, dtype=np.int64)
+    for row in range(count):
+        # 잔고가 이전 체결에 의존하는 부분만 경로별로 신호 지점을 순서대로 처리
+        result = backtest.simulate_crossover(paths[row], ma_short[row], ma_long[row], initial_balance)
+        equity = 1 + result["interests"] / 100
+        roi[row] = result["interests"][-1]
+        max_drawdown[row] = (equity / np.maximum.accumulate(equity) - 1).min() * 100
+        trades[row] = len(result["signal_index"])
+    return roi, max_drawdown, trades
+
+
+def run_batch(task):
+    """작업 하나 = 시드 하나로 만든 경로 배치"""
+    seed, count = task
+    returns, start_price, length, block_size, short_window, long_window, jitter = _context
+    rng = np.random.default_rng(seed)
+    paths = bootstrap_paths(rng, returns, start_price, count, length, block_size)
+    short, long = jitter_windows(rng, count, short_window, long_window, jitter)
+    roi, max_drawdown, trades = evaluate_batch(paths, short, long)
+    return short, long, roi, max_drawdown, trades
+
+
+def _init_worker(*context):
+    global _context
+    _context = context
+
+
+def run_robustness(prices, paths=1000, length=None, block_size=30, short_window=20, long_window=60,
+                   jitter=0.0, batch_size=64, processes=None, seed=0, demean=False):
+    """부트스트랩 경로 전체를 배치로 나눠 병렬 평가 후 경로별 결과 배열 dict 반환"""
+    prices = np.asarray(prices)
+    returns = log_returns(prices)
+    if len(returns) == 0:
+        raise ValueError("수익률을 계산할 분봉이 부족합니다")
+    if demean:
+        # 원본보다 긴 경로에서 원본 구간의 추세가 복리로 부풀려지지 않도록 평균 수익률 제거
+        returns = returns - returns.mean()
+    length = length or len(prices)
+
+    # 배치마다 독립적인 난수 스트림 (프로세스 수와 관계없이 같은 시드면 같은 결과)
+    counts = [min(batch_size, paths - start) for start in range(0, paths, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    context = (returns, prices[0].item(), length, block_size, short_window, long_window, jitter)
+
+    parts = []
+    with ProcessPoolExecutor(max_workers=min(processes or os.cpu_count(), len(counts)),
+                             initializer=_init_worker, initargs=context) as pool:
+        for done, part in enumerate(pool.map(run_batch, zip(seeds, counts)), 1):
+            parts.append(part)
+            print(f"  진행: {min(done * batch_size, paths)}/{paths}", end="\r")
+    print()
+
+    short, long, roi, max_drawdown, trades = (np.concatenate(column) for column in zip(*parts))
+    return {"short": short, "long": long, "roi": roi, "max_drawdown": max_drawdown, "trades": trades}
+
+
+def summarize(results):
+    """수익률/낙폭 분위수와 손실 확률"""
+    return {
+        "roi": dict(zip(PERCENTILES, np.percentile(results["roi"], PERCENTILES))),
+        "max_drawdown": dict(zip(PERCENTILES, np.percentile(results["max_drawdown"], PERCENTILES))),
+        "loss_probability": float(np.mean(results["roi"] < 0)) * 100,
+        "mean_trades": float(np.mean(results["trades"])),
+    }
+
+
+def print_summary(summary, baseline):
+    print(f"📊 원본 시계열: 수익률 {baseline['roi']:.2f}%, MDD {baseline['max_drawdown']:.2f}%")
+    print(f"{'':>8}" + "".join(f"{f'p{p}':>10}" for p in PERCENTILES))
+    for key, label in (("roi", "수익률"), ("max_drawdown", "MDD")):
+        print(f"{label:>8}" + "".join(f"{summary[key][p]:>10.2f}" for p in PERCENTILES))
+    print(f"📉 손실 확률: {summary['loss_probability']:.1f}%, 평균 거래 수: {summary['mean_trades']:.1f}")
+
+
+def save_csv(results, filename):
+    columns = ["short", "long", "roi", "max_drawdown", "trades"]
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path"] + columns)
+        for path, row in enumerate(zip(*(results[column].tolist() for column in columns))):
+            writer.writerow([path, *row])
+    print(f"💾 경로별 결과 저장: {filename}")
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"1 이상이어야 합니다: {text}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="이동평균 크로스 부트스트랩 강건성 분석")
+    parser.add_argument("file", nargs="?", default="sample.json", help="분봉 JSON 파일")
+    parser.add_argument("--paths", type=positive_int, default=1000, help="경로 수")
+    parser.add_argument("--bars", type=positive_int, default=None, help="경로 길이 (기본: 원본 길이, 1년 약 95000)")
+    parser.add_argument("--block", type=positive_int, default=30, help="부트스트랩 블록 길이 (분봉 수)")
+    parser.add_argument("--short", type=int, default=20, help="단기 이동평균 윈도우")
+    parser.add_argument("--long", type=int, default=60, help="장기 이동평균 윈도우")
+    parser.add_argument("--jitter", type=float, default=0.0, help="윈도우 흔들기 비율 (예: 0.2 = ±20%%)")
+    parser.add_argument("--demean", action="store_true", help="수익률 평균 제거 (추세 없는 경로)")
+    parser.add_argument("--batch", type=positive_int, default=64, help="배치당 경로 수")
+    parser.add_argument("--processes", type=positive_int, default=None, help="프로세스 수 (기본: 코어 수)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="경로별 결과 CSV 경로")
+    args = parser.parse_args()
+
+    prices = np.asarray(backtest.load_prices(args.file), dtype=np.int64)
+    short, long = np.array([args.short]), np.array([args.long])
+    roi, max_drawdown, _ = evaluate_batch(prices[None, :], short, long)
+    baseline = {"roi": roi[0], "max_drawdown": max_drawdown[0]}
+
+    results = run_robustness(prices, args.paths, args.bars, args.block, args.short, args.long,
+                             args.jitter, args.batch, args.processes, args.seed, args.demean)
+    print_summary(summarize(results), baseline)
+    if args.output:
+        save_csv(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,8 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+import indicator
+
 def ma_signal(ma_short_term, ma_long_term):
     if len(ma_short_term) < 2 or len(ma_long_term) < 2:
         return None
@@ -12,3 +17,129 @@ def ma_signal(ma_short_term, ma_long_term):
         return "SELL"
     else:
         return None
+
+
+def ma_signal_series(ma_short_term, ma_long_term):
+    # ma_signal 을 모든 시점에 적용한 결과를 한 번에 계산 (None/NaN 구간은 신호 없음)
+    length = min(len(ma_short_term), len(ma_long_term))
+    short = np.asarray(ma_short_term[:length], dtype=float)
+    long = np.asarray(ma_long_term[:length], dtype=float)
+    diff = short - long
+    prev = diff[:-1]
+    current = diff[1:]
+    buy = (prev < 0) & (current >= 0)
+    sell = (prev >= 0) & (current < 0)
+    index = np.flatnonzero(buy | sell) + 1
+    return index, np.where(buy[index - 1], "BUY", "SELL")
+
+
+class Strategy(ABC):
+    # 전략 인터페이스: 실시간 매매용 on_bar 와 리서치용 run 이 같은 신호를 내야 함
+    @abstractmethod
+    def on_bar(self, price):
+        # 새 가격 하나를 반영하고 "BUY", "SELL" 또는 None 반환
+        ...
+
+    @abstractmethod
+    def run(self, prices):
+        # 전체 가격 배열에 대한 (신호 인덱스 배열, 신호 배열) 반환
+        ...
+
+
+class MACrossStrategy(Strategy):
+    def __init__(self, short_window=20, long_window=60):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.short = indicator.MovingAverage(short_window)
+        self.long = indicator.MovingAverage(long_window)
+        self.prev_diff = None
+
+    def on_bar(self, price):
+        ma_short = self.short.update(price)
+        ma_long = self.long.update(price)
+        prev = self.prev_diff
+        current = None if ma_short is None or ma_long is None else ma_short - ma_long
+        self.prev_diff = current
+        if prev is None or current is None:
+            return None
+        if prev < 0 and current >= 0:
+            return "BUY"
+        elif prev >= 0 and current < 0:
+            return "SELL"
+        else:
+            return None
+
+    def run(self, prices):
+        prefix = indicator.prefix_sum(prices)
+        ma_short = indicator.ma_array(prices, self.short_window, prefix)
+        ma_long = indicator.ma_array(prices, self.long_window, prefix)
+        return ma_signal_series(ma_short, ma_long)
+
+
+class FloorMACrossStrategy(Strategy):
+    # updated_main 실매매 루프 규칙: 이동평균은 정수 내림(total // window),
+    # 직전 봉에서 두 이동평균이 같았으면 어느 쪽으로 벌어져도 교차로 봄 (<=, >=)
+    def __init__(self, short_window=20, long_window=60, prices=()):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.short = indicator.MovingAverage(short_window)
+        self.long = indicator.MovingAverage(long_window)
+        self.ma_short = None  # 마지막 봉의 내림 이동평균 (데이터 부족이면 None)
+        self.ma_long = None
+        self.prev = None
+        # 기존 가격으로 이동평균과 직전 값만 채움 (신호는 버림)
+        for price in prices:
+            self.on_bar(price)
+
+    def on_bar(self, price):
+        short = self.short.update(price)
+        long = self.long.update(price)
+        self.ma_short = None if short is None else self.short.total // self.short_window
+        self.ma_long = None if long is None else self.long.total // self.long_window
+        if self.ma_short is None or self.ma_long is None:
+            return None
+        prev, self.prev = self.prev, (self.ma_short, self.ma_long)
+        if prev is None:
+            return None
+        if prev[0] <= prev[1] and self.ma_short > self.ma_long:
+            return "BUY"
+        elif prev[0] >= prev[1] and self.ma_short < self.ma_long:
+            return "SELL"
+        else:
+            return None
+
+    def run(self, prices):
+        prefix = indicator.prefix_sum(prices)
+        ma_short = self._floor_ma(prefix, self.short_window)
+        ma_long = self._floor_ma(prefix, self.long_window)
+        # NaN 이 섞인 비교는 False 이므로 데이터 부족 구간은 신호 없음
+        buy = (ma_short[:-1] <= ma_long[:-1]) & (ma_short[1:] > ma_long[1:])
+        sell = (ma_short[:-1] >= ma_long[:-1]) & (ma_short[1:] < ma_long[1:])
+        index = np.flatnonzero(buy | sell) + 1
+        return index, np.where(buy[index - 1], "BUY", "SELL")
+
+    @staticmethod
+    def _floor_ma(prefix, window_size):
+        result = np.full(len(prefix) - 1, np.nan)
+        if len(result) >= window_size:
+            result[window_size - 1:] = (prefix[window_size:] - prefix[:-window_size]) // window_size
+        return result
+
+
+def check_equivalence(make_strategy, prices):
+    # 같은 데이터로 on_bar 경로와 run 경로를 돌려 서로 다른 시점 목록 반환
+    # 반환값: [(인덱스, on_bar 신호, run 신호), ...] (비어 있으면 일치)
+    live = make_strategy()
+    streaming = {}
+    for i, price in enumerate(prices):
+        signal = live.on_bar(price)
+        if signal is not None:
+            streaming[i] = signal
+    index, signals = make_strategy().run(prices)
+    vectorized = dict(zip(index.tolist(), signals.tolist()))
+
+    mismatches = []
+    for i in sorted(streaming.keys() | vectorized.keys()):
+        if streaming.get(i) != vectorized.get(i):
+            mismatches.append((i, streaming.get(i), vectorized.get(i)))
+    return mismatches
@@ -0,0 +1,294 @@
+# sweep.py
+"""
+이동평균 크로스 윈도우 파라미터 스윕
+
+  python sweep.py sample.json --short 5:40:5 --long 20:120:10
+  python sweep.py a.json b.json --processes 8 --output sweep.csv
+
+여러 로컬 워커 프로세스로 나누어 실행하기:
+
+  python sweep.py sample.json --serve 127.0.0.1:50000
+  python sweep.py --worker 127.0.0.1:50000   (원하는 만큼 실행)
+
+--task-timeout 초 동안 결과가 하나도 오지 않으면 (워커 종료 등) 끝나지 않은 작업을 다시 큐에 넣습니다.
+"""
+
+import argparse
+import csv
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+
+import backtest
+import indicator
+
+INITIAL_BALANCE = 1000 * 10000
+AUTHKEY = b"ma-sweep"
+
+# 워커 프로세스에서 붙인 공유 메모리 (이름 -> (SharedMemory, 배열))
+_attached = {}
+# 독립 실행 워커는 자기 resource_tracker가 세그먼트를 지우지 않도록 등록 해제
+_untrack = False
+
+
+class SharedArray:
+    """공유 메모리에 올린 배열 (작업에는 이름과 모양만 전달)"""
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.descriptor = (self.shm.name, array.shape, array.dtype.str)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)[:] = array
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def attach(descriptor):
+    """공유 배열 열기 (프로세스당 한 번)"""
+    name, shape, dtype = descriptor
+    if name not in _attached:
+        shm = shared_memory.SharedMemory(name=name)
+        if _untrack:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        _attached[name] = (shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+    return _attached[name][1]
+
+
+def parse_windows(text):
+    """'5:40:5' (시작:끝:간격, 끝 포함) 또는 '5,10,20' 형식"""
+    if ":" in text:
+        start, stop, step = (int(part) for part in text.split(":"))
+        return list(range(start, stop + 1, step))
+    return [int(part) for part in text.split(",")]
+
+
+def make_tasks(series_names, short_windows, long_windows):
+    """(시계열, 단기 윈도우) 단위로 묶어 단기 이동평균을 한 번만 계산"""
+    tasks = []
+    for name in series_names:
+        for short in short_windows:
+            longs = [long for long in long_windows if long > short]
+            if longs:
+                tasks.append((name, short, longs))
+    return tasks
+
+
+def evaluate(task, series, initial_balance=INITIAL_BALANCE):
+    """한 작업의 모든 (단기, 장기) 조합 백테스트"""
+    name, short, longs = task
+    prices_descriptor, prefix_descriptor = series[name]
+    prices = attach(prices_descriptor)
+    prefix = attach(prefix_descriptor)
+
+    ma_short = indicator.ma_array(prices, short, prefix)
+    rows = []
+    for long in longs:
+        ma_long = indicator.ma_array(prices, long, prefix)
+        result = backtest.simulate_crossover(prices, ma_short, ma_long, initial_balance)
+        interests = result["interests"]
+        equity = 1 + interests / 100
+        drawdown = equity / np.maximum.accumulate(equity) - 1
+        rows.append({
+            "series": name,
+            "short": short,
+            "long": long,
+            "roi": float(interests[-1]) if len(interests) else 0.0,
+            "max_drawdown": float(drawdown.min()) * 100 if len(drawdown) else 0.0,
+            "trades": len(result["signal_index"]),
+        })
+    return rows
+
+
+def _init_worker(series):
+    global _series
+    _series = series
+
+
+def _evaluate_in_pool(task):
+    return evaluate(task, _series)
+
+
+def share_series(filenames):
+    """가격과 누적합을 공유 메모리에 올리기 (누적합은 모든 윈도우에서 재사용)"""
+    shared = []
+    series = {}
+    for filename in filenames:
+        prices = np.asarray(backtest.load_prices(filename), dtype=np.int64)
+        prices_shared = SharedArray(prices)
+        prefix_shared = SharedArray(indicator.prefix_sum(prices))
+        shared += [prices_shared, prefix_shared]
+        series[filename] = (prices_shared.descriptor, prefix_shared.descriptor)
+    return shared, series
+
+
+def run_sweep(filenames, short_windows, long_windows, processes=None):
+    """프로세스 풀로 스윕 실행 후 수익률 순으로 정렬된 결과 반환"""
+    shared, series = share_series(filenames)
+    try:
+        tasks = make_tasks(series, short_windows, long_windows)
+        rows = []
+        with ProcessPoolExecutor(max_workers=processes or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(series,)) as pool:
+            for task_rows in pool.map(_evaluate_in_pool, tasks):
+                rows.extend(task_rows)
+    finally:
+        for item in shared:
+            item.close()
+    return rank(rows)
+
+
+def rank(rows):
+    """수익률 내림차순, 같으면 낙폭이 작은 순"""
+    return sorted(rows, key=lambda row: (-row["roi"], -row["max_drawdown"]))
+
+
+# 작업 큐 모드 (로컬 여러 워커 프로세스)
+class QueueManager(BaseManager):
+    pass
+
+
+def parse_address(text):
+    host, port = text.rsplit(":", 1)
+    return host, int(port)
+
+
+def serve_sweep(filenames, short_windows, long_windows, address, task_timeout=300):
+    """작업 큐 서버: 작업을 넣고 워커들이 돌려준 결과를 모으기
+
+    task_timeout 초 동안 결과가 없고 큐도 비어 있으면 가져간 워커가 죽은 것으로 보고
+    아직 결과가 없는 작업을 다시 넣음 (같은 작업 결과가 두 번 오면 먼저 온 것만 사용)
+    """
+    task_queue = queue.Queue()
+    result_queue = queue.Queue()
+    shared, series = share_series(filenames)
+    tasks = make_tasks(series, short_windows, long_windows)
+    for task_id, task in enumerate(tasks):
+        task_queue.put((task_id, series, task))
+
+    QueueManager.register("get_tasks", callable=lambda: task_queue)
+    QueueManager.register("get_results", callable=lambda: result_queue)
+    manager = QueueManager(address=address, authkey=AUTHKEY)
+    server = manager.get_server()
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📡 작업 큐 대기 중: {address[0]}:{address[1]} (작업 {len(tasks)}개)")
+
+    results = {}
+    last_result = time.monotonic()
+    try:
+        while len(results) < len(tasks):
+            try:
+                task_id, task_rows = result_queue.get(timeout=1)
+            except queue.Empty:
+                if time.monotonic() - last_result >= task_timeout and task_queue.empty():
+                    missing = [task_id for task_id in range(len(tasks)) if task_id not in results]
+                    print(f"\n⚠️ {task_timeout:g}초 동안 결과 없음: 작업 {len(missing)}개 다시 넣음")
+                    for task_id in missing:
+                        task_queue.put((task_id, series, tasks[task_id]))
+                    last_result = time.monotonic()
+                continue
+            last_result = time.monotonic()
+            results.setdefault(task_id, task_rows)
+            print(f"  진행: {len(results)}/{len(tasks)}", end="\r")
+        print()
+        # 다시 넣었던 남은 작업은 버리고 워커들에게 종료 신호
+        while not task_queue.empty():
+            task_queue.get_nowait()
+        task_queue.put(None)
+    finally:
+        for item in shared:
+            item.close()
+    return rank([row for task_rows in results.values() for row in task_rows])
+
+
+def run_worker(address):
+    """작업 큐 워커: 서버가 종료 신호를 보내거나 연결이 끊길 때까지 작업을 가져와서 평가
+
+    큐가 잠시 비어도 기다림 (서버가 task_timeout 뒤에 작업을 다시 넣을 수 있음)
+    """
+    global _untrack
+    _untrack = True
+    QueueManager.register("get_tasks")
+    QueueManager.register("get_results")
+    manager = QueueManager(address=address, authkey=AUTHKEY)
+    manager.connect()
+    tasks = manager.get_tasks()
+    results = manager.get_results()
+    count = 0
+    while True:
+        try:
+            item = tasks.get(timeout=1)
+        except queue.Empty:
+            continue
+        except (EOFError, ConnectionError):
+            break
+        if item is None:
+            tasks.put(None)  # 다른 워커도 종료하도록 되돌려 놓음
+            break
+        task_id, series, task = item
+        try:
+            results.put((task_id, evaluate(task, series)))
+        except (EOFError, ConnectionError):
+            break
+        count += 1
+    print(f"👷 워커 종료: 작업 {count}개 처리")
+
+
+def print_table(rows, top=20):
+    print(f"{'순위':>4} {'시계열':<20} {'단기':>5} {'장기':>5} {'수익률(%)':>10} {'MDD(%)':>9} {'거래':>5}")
+    for rank_no, row in enumerate(rows[:top], 1):
+        print(f"{rank_no:>4} {row['series'][-20:]:<20} {row['short']:>5} {row['long']:>5} "
+              f"{row['roi']:>10.2f} {row['max_drawdown']:>9.2f} {row['trades']:>5}")
+
+
+def save_csv(rows, filename):
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["series", "short", "long", "roi", "max_drawdown", "trades"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="이동평균 크로스 윈도우 파라미터 스윕")
+    parser.add_argument("files", nargs="*", help="분봉 JSON 파일")
+    parser.add_argument("--short", default="5:40:5", help="단기 윈도우 (예: 5:40:5 또는 5,10,20)")
+    parser.add_argument("--long", default="20:120:10", help="장기 윈도우")
+    parser.add_argument("--processes", type=int, default=None, help="프로세스 수 (기본: 코어 수)")
+    parser.add_argument("--top", type=int, default=20, help="출력할 상위 결과 수")
+    parser.add_argument("--output", help="전체 결과 CSV 저장 경로")
+    parser.add_argument("--serve", metavar="HOST:PORT", help="작업 큐 서버로 실행")
+    parser.add_argument("--worker", metavar="HOST:PORT", help="작업 큐 워커로 실행")
+    parser.add_argument("--task-timeout", type=float, default=300,
+                        help="이 시간(초) 동안 결과가 없으면 끝나지 않은 작업을 다시 넣음 (--serve)")
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(parse_address(args.worker))
+        return
+    if not args.files:
+        parser.error("분봉 JSON 파일이 필요합니다")
+
+    short_windows = parse_windows(args.short)
+    long_windows = parse_windows(args.long)
+    if args.serve:
+        rows = serve_sweep(args.files, short_windows, long_windows, parse_address(args.serve),
+                           args.task_timeout)
+    else:
+        rows = run_sweep(args.files, short_windows, long_windows, args.processes)
+
+    print_table(rows, args.top)
+    if args.output:
+        save_csv(rows, args.output)
+        print(f"💾 결과 저장: {args.output} ({len(rows)}개)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# synthetic.py
+"""
+벤치마크/백테스트용 재현 가능한 합성 분봉 (같은 시드면 같은 데이터)
+"""
+
+import numpy as np
+
+
+def synthetic_prices(n, seed=0, start=20000, tick=10):
+    """호가 단위로 움직이는 재현 가능한 랜덤워크 분봉 종가"""
+    rng = np.random.default_rng(seed)
+    steps = rng.integers(-3, 4, size=n) * tick
+    return np.maximum(np.cumsum(steps) + start, tick)
+
+
+def synthetic_bars(n, seed=0, tick=10):
+    """합성 OHLCV 분봉 (bar_cache.load_bars 와 같은 필드 이름)"""
+    rng = np.random.default_rng(seed)
+    close = synthetic_prices(n, seed, tick=tick)
+    open_ = np.r_[close[:1], close[:-1]]
+    spread = rng.integers(0, 3, size=(2, n)) * tick
+    return {
+        "stck_prpr": close,
+        "stck_oprc": open_,
+        "stck_hgpr": np.maximum(open_, close) + spread[0],
+        "stck_lwpr": np.minimum(open_, close) - spread[1],
+        "cntg_vol": rng.integers(0, 200000, size=n),
+    }
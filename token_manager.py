@@ -0,0 +1,180 @@
+# token_manager.py
+"""
+KIS 접근 토큰 관리
+
+/oauth2/tokenP 로 발급한 토큰을 만료 시각과 함께 디스크 캐시에 저장하고,
+같은 앱키를 쓰는 모든 프로세스(gunicorn 워커, 자동매매 루프)가 파일 잠금으로 하나의 토큰을 공유합니다.
+만료가 가까워지면 백그라운드 스레드가 미리 새 토큰을 받아 둡니다.
+
+  python token_manager.py            캐시된 토큰 상태 확인 (없거나 만료 임박이면 발급)
+  python token_manager.py --refresh  새 토큰 강제 발급
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: 프로세스 간 잠금 없이 동작
+    fcntl = None
+
+load_dotenv()
+
+BASE_URL = os.environ.get("KIS_BASE_URL", "https://openapi.koreainvestment.com:9443")
+CACHE_PATH = os.environ.get("KIS_TOKEN_CACHE", os.path.join(tempfile.gettempdir(), "kis_token.json"))
+
+# 남은 유효 시간이 이보다 짧으면 사용하지 않고 새로 발급 (초)
+MIN_VALIDITY = 60
+# 백그라운드 갱신: 남은 유효 시간이 이보다 짧아지면 미리 발급 (초)
+REFRESH_AHEAD = 3600
+
+
+class TokenManager:
+    def __init__(self, appkey=None, appsecret=None, base_url=None, cache_path=CACHE_PATH):
+        self.appkey = appkey or os.environ.get("APPKEY")
+        self.appsecret = appsecret or os.environ.get("APPSECRET")
+        self.base_url = base_url or BASE_URL
+        self.cache_path = cache_path
+        self.access_token = None
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.refresher = None
+        self.issued = 0  # 이 프로세스에서 실제로 발급 요청한 횟수
+
+    @property
+    def fingerprint(self):
+        # 캐시 파일에 앱키 자체는 남기지 않고 다른 앱키/서버(실전, 모의투자, 시뮬레이터)의 토큰을 쓰지 않도록 구분만 함
+        return hashlib.sha256(f"{self.base_url}|{self.appkey or ''}".encode()).hexdigest()[:16]
+
+    def get_token(self):
+        """유효한 토큰 반환 (메모리 -> 디스크 캐시 -> 새 발급 순서)"""
+        if self.access_token and self.expires_at - time.time() > MIN_VALIDITY:
+            return self.access_token
+        return self.refresh(min_validity=MIN_VALIDITY)
+
+    def refresh(self, min_validity=MIN_VALIDITY, force=False):
+        """잠금을 잡고 디스크 캐시를 다시 확인한 뒤, 남은 시간이 min_validity 보다 짧으면 새로 발급"""
+        with self.lock, self._file_lock():
+            if not force:
+                cached = self._read_cache()
+                if cached and cached["expires_at"] - time.time() > min_validity:
+                    self.access_token, self.expires_at = cached["access_token"], cached["expires_at"]
+                    return self.access_token
+            self.access_token, self.expires_at = self._issue()
+            self._write_cache()
+            return self.access_token
+
+    def _issue(self):
+        res = requests.post(f"{self.base_url}/oauth2/tokenP", json={
+            "grant_type": "client_credentials",
+            "appkey": self.appkey,
+            "appsecret": self.appsecret,
+        }, timeout=(3.05, 10))
+        data = res.json()
+        if "access_token" not in data:
+            raise RuntimeError(f"토큰 발급 실패: {data.get('error_description') or data}")
+        self.issued += 1
+        return data["access_token"], time.time() + int(data.get("expires_in", 86400))
+
+    def _file_lock(self):
+        return _FileLock(self.cache_path + ".lock")
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get("appkey") != self.fingerprint:
+            return None
+        return cached
+
+    def _write_cache(self):
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=".kis_token")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"appkey": self.fingerprint, "access_token": self.access_token,
+                       "expires_at": self.expires_at}, f)
+        os.chmod(temp, 0o600)
+        os.replace(temp, self.cache_path)
+
+    def start_refresher(self, refresh_ahead=REFRESH_AHEAD):
+        """만료 refresh_ahead 초 전에 미리 새 토큰을 받는 데몬 스레드 시작 (프로세스당 한 번)"""
+        if self.refresher is not None:
+            return self.refresher
+
+        def run():
+            while True:
+                try:
+                    self.get_token()
+                    # 발급은 분당 1회 제한이므로 최소 1분 간격
+                    time.sleep(max(self.expires_at - time.time() - refresh_ahead, 60))
+                    # 다른 프로세스가 먼저 갱신했으면 그 토큰을 받고, 아니면 새로 발급
+                    self.refresh(min_validity=refresh_ahead)
+                except Exception as e:
+                    print(f"❌ 토큰 갱신 실패: {e}")
+                    time.sleep(60)  # 발급은 분당 1회 제한
+
+        self.refresher = threading.Thread(target=run, name="kis-token-refresher", daemon=True)
+        self.refresher.start()
+        return self.refresher
+
+    def status(self):
+        remaining = self.expires_at - time.time()
+        return {
+            "valid": bool(self.access_token) and remaining > 0,
+            "expires_at": datetime.fromtimestamp(self.expires_at).isoformat() if self.expires_at else None,
+            "remaining_seconds": max(int(remaining), 0),
+            "issued": self.issued,
+        }
+
+
+class _FileLock:
+    """프로세스 간 배타 잠금 (fcntl.flock)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+# 프로세스 공용 토큰 관리자
+manager = TokenManager()
+
+
+def get_token():
+    return manager.get_token()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="KIS 접근 토큰 발급/캐시 상태")
+    parser.add_argument("--refresh", action="store_true", help="캐시와 관계없이 새 토큰 발급")
+    args = parser.parse_args()
+
+    if args.refresh:
+        manager.refresh(force=True)
+    else:
+        manager.get_token()
+    status = manager.status()
+    print(f"🔑 토큰 {'새로 발급' if manager.issued else '캐시 사용'}: {CACHE_PATH}")
+    print(f"⏰ 만료: {status['expires_at']} (남은 시간 {status['remaining_seconds'] // 60}분)")
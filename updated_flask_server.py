@@ -1,7 +1,14 @@
 # updated_flask_server.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
+from functools import wraps
+import hmac
+import os
 import api
+import async_api
+import indicator_cache
+import quote_cache
+import rate_limit
 from database import TradingDatabase
 from datetime import datetime, timedelta
 import json
@@ -10,7 +17,34 @@ app = Flask(__name__)
 CORS(app)
 
 # 데이터베이스 초기화
-db = TradingDatabase("trading_data.db")
+DATABASE_PATH = "trading_data.db"
+db = TradingDatabase(DATABASE_PATH)
+
+def save_quote(code, price):
+    """증권사에서 새 가격을 받아왔을 때만 기록 (캐시 적중시에는 기록 안 함)"""
+    db.save_price_data(code, price)
+    db.log_info(f"가격 조회: {code} - {price:,}원")
+
+# 같은 종목 동시 조회는 증권사 요청 한 번으로 합침 (/prices 의 캐시에 없는 종목은 비동기로 한 번에 조회)
+quotes = quote_cache.QuoteCache(on_refresh=save_quote, fetch_many=async_api.current_prices)
+
+# 호출자가 KIS 토큰을 보내지 않으면 이 키(X-API-Key 헤더)를 확인한 뒤에만 서버 공유 토큰 사용
+TRADING_API_KEY = os.environ.get("TRADING_API_KEY")
+
+def require_trading_auth(f):
+    """주문/계좌 엔드포인트 인증 (호출자 KIS 토큰 또는 서버 API 키)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        data = request.get_json(silent=True) or {}
+        token = data.get("token") or request.args.get("token")
+        if not token:
+            api_key = request.headers.get("X-API-Key", "")
+            if not TRADING_API_KEY or not hmac.compare_digest(api_key, TRADING_API_KEY):
+                return jsonify({"error": "KIS 토큰 또는 API 키가 필요합니다"}), 401
+        g.kis_token = token or None
+        return f(*args, **kwargs)
+    
+    return decorated_function
 
 @app.route("/price")
 def get_price():
@@ -18,23 +52,37 @@ def get_price():
     code = request.args.get("code")
     token = request.args.get("token")
     
-    if not code or not token:
+    if not code:
         return jsonify({"error": "Missing parameters"}), 400
 
-    api.ACCESS_TOKEN = token
-    price = api.fetch_current_price(code)
+    price = quotes.get(code, token=token)
     
     if price is not None:
-        # 데이터베이스에 가격 저장
-        db.save_price_data(code, price)
-        db.log_info(f"가격 조회: {code} - {price:,}원")
-        
         return jsonify({"price": price})
     else:
         db.log_error(f"가격 조회 실패: {code}")
         return jsonify({"error": "가격 조회 실패"}), 500
 
+@app.route("/prices")
+def get_prices():
+    """여러 종목 현재가 동시 조회 (codes=122640,005930,...)"""
+    codes = request.args.get("codes")
+    token = request.args.get("token")
+    
+    if not codes:
+        return jsonify({"error": "Missing parameters"}), 400
+
+    codes = [code.strip() for code in codes.split(",") if code.strip()]
+    prices = quotes.get_many(codes, token=token)
+    
+    failed = [code for code, price in prices.items() if price is None]
+    if failed:
+        db.log_error(f"가격 조회 실패: {', '.join(failed)}")
+    
+    return jsonify({"prices": prices})
+
 @app.route("/order", methods=["POST"])
+@require_trading_auth
 def make_order():
     """주문 실행"""
     data = request.get_json()
@@ -43,18 +91,15 @@ def make_order():
     code = data.get("code")
     amount = data.get("amount")
     price = data.get("price")
-    token = data.get("token")
 
-    if not all([order_type, account, code, amount, price, token]):
+    if not all([order_type, account, code, amount, price]):
         return jsonify({"error": "누락된 요청 데이터"}), 400
 
-    api.ACCESS_TOKEN = token
-    
     # 데이터베이스에 주문 기록 (PENDING 상태)
     order_id = db.save_order(code, order_type, amount, price, "PENDING")
     
     try:
-        success = api.order(order_type, account, code, amount, price)
+        success = api.order(order_type, account, code, amount, price, token=g.kis_token)
         
         if success:
             # 성공시 상태 업데이트
@@ -77,22 +122,20 @@ def make_order():
         return jsonify({"success": False, "error": str(e), "order_id": order_id}), 500
 
 @app.route("/fetch_quantity")
+@require_trading_auth
 def fetch_quantity():
     """보유 수량 조회"""
     account = request.args.get("account")
     code = request.args.get("code")
-    token = request.args.get("token")
     
-    if not all([account, code, token]):
+    if not all([account, code]):
         return jsonify({"error": "Missing parameters"}), 400
 
-    api.ACCESS_TOKEN = token
-    
     try:
-        quantity = api.fetch_quantity(account, code)
+        quantity = api.fetch_quantity(account, code, token=g.kis_token)
         
         # 데이터베이스에 계좌 상태 저장
-        total_eval = api.fetch_eval(account)
+        total_eval = api.fetch_eval(account, token=g.kis_token)
         if total_eval:
             db.save_account_status(account, code, int(quantity), int(total_eval))
         
@@ -105,20 +148,19 @@ def fetch_quantity():
         return jsonify({"error": str(e)}), 500
 
 @app.route("/clear_orders", methods=["POST"])
+@require_trading_auth
 def clear_orders():
     """미체결 주문 정리"""
     data = request.get_json()
     account = data.get("account")
     code = data.get("code")
-    token = data.get("token")
 
-    if not all([account, code, token]):
+    if not all([account, code]):
         return jsonify({"error": "누락된 요청 데이터"}), 400
 
-    api.ACCESS_TOKEN = token
-    
     try:
-        api.clear_orders(account, code)
+        # 자동매매 루프나 HTS 등 다른 곳에서 낸 주문도 정리하도록 항상 미체결 조회
+        api.clear_orders(account, code, force=True, token=g.kis_token)
         db.log_info(f"미체결 주문 정리: {code}")
         
         return jsonify({"message": "미체결 주문 정리 완료"})
@@ -128,18 +170,16 @@ def clear_orders():
         return jsonify({"error": str(e)}), 500
 
 @app.route("/fetch_eval")
+@require_trading_auth
 def fetch_eval():
     """총 평가금 조회"""
     account = request.args.get("account")
-    token = request.args.get("token")
     
-    if not all([account, token]):
+    if not all([account]):
         return jsonify({"error": "Missing parameters"}), 400
 
-    api.ACCESS_TOKEN = token
-    
     try:
-        evaluation = api.fetch_eval(account)
+        evaluation = api.fetch_eval(account, token=g.kis_token)
         
         if evaluation:
             evaluation = int(evaluation)
@@ -180,7 +220,14 @@ def get_moving_averages():
     
     try:
         ma_data = db.get_latest_moving_averages(code, int(count))
-        return jsonify({"moving_averages": ma_data})
+        
+        # 현재 이동평균 (캐시된 값에 매매 루프의 새 봉만 반영)
+        load_bars = indicator_cache.price_bar_loader(DATABASE_PATH, code)
+        current = {
+            "ma20": indicator_cache.cache.get(code, "floor_ma", (20,), load_bars),
+            "ma60": indicator_cache.cache.get(code, "floor_ma", (60,), load_bars)
+        }
+        return jsonify({"moving_averages": ma_data, "current": current})
         
     except Exception as e:
         db.log_error(f"이동평균 데이터 조회 실패: {e}")
@@ -288,10 +335,10 @@ def get_dashboard():
         if recent_prices:
             current_price = recent_prices[0]
         
-        # 최근 이동평균
-        ma_data = db.get_latest_moving_averages(code, 1)
-        ma20 = ma_data[0]['ma20'] if ma_data else None
-        ma60 = ma_data[0]['ma60'] if ma_data else None
+        # 최근 이동평균 (캐시된 값에 매매 루프의 새 봉만 반영)
+        load_bars = indicator_cache.price_bar_loader(DATABASE_PATH, code)
+        ma20 = indicator_cache.cache.get(code, "floor_ma", (20,), load_bars)
+        ma60 = indicator_cache.cache.get(code, "floor_ma", (60,), load_bars)
         
         # 오늘의 통계
         today_stats = db.get_statistics(code, 1)
@@ -367,6 +414,9 @@ def get_status():
             "server_time": datetime.now().isoformat(),
             "database_connected": True,
             "recent_activity": recent_activity,
+            "indicator_cache": indicator_cache.cache.stats(),
+            "rate_limit": rate_limit.limiter.stats(),
+            "quote_cache": quotes.stats(),
             "version": "1.0.0"
         }
         
@@ -1,48 +1,36 @@
 # updated_main.py
 from time import sleep
-import indicator
 import strategy
 import api
+import token_manager
 from database import TradingDatabase
 from dotenv import load_dotenv
 import os
-from typing import List
 
 load_dotenv()
 
 APPKEY = os.environ["APPKEY"]
 APPSECRET = os.environ["APPSECRET"]
 ACCOUNT = os.environ["ACCOUNT"]
-ACCESS_TOKEN = os.environ["ACCESS_TOKEN"]
+ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN")
 
 CODE = "122640"
 
+# KIS_STREAM=1 이면 REST 시세 조회 대신 웹소켓 실시간 체결가 사용 (websockets 패키지 필요)
+USE_STREAM = os.environ.get("KIS_STREAM") == "1"
+STREAM_MAX_AGE = 120  # 이보다 오래된 체결가는 쓰지 않고 REST 로 조회 (초)
+stream = None
+
 # 데이터베이스 초기화
 db = TradingDatabase("trading_data.db")
 
-def calculate_ma(prices: List[int], period: int) -> int:
-    """이동평균 계산"""
-    if len(prices) < period:
-        return None
-    return sum(prices[-period:]) // period
-
-def get_ma_signal(ma20_list: List[int], ma60_list: List[int]) -> str:
-    """이동평균 기반 매매 신호 생성"""
-    if len(ma20_list) < 2 or len(ma60_list) < 2:
-        return "HOLD"
-    
-    # 골든크로스/데드크로스 확인
-    prev_ma20, curr_ma20 = ma20_list[-2], ma20_list[-1]
-    prev_ma60, curr_ma60 = ma60_list[-2], ma60_list[-1]
-    
-    # 골든크로스: MA20이 MA60을 상향 돌파
-    if prev_ma20 <= prev_ma60 and curr_ma20 > curr_ma60:
-        return "BUY"
-    # 데드크로스: MA20이 MA60을 하향 돌파
-    elif prev_ma20 >= prev_ma60 and curr_ma20 < curr_ma60:
-        return "SELL"
-    
-    return "HOLD"
+def fetch_price():
+    """현재가 (실시간 스트림의 최근 체결가, 없거나 오래됐으면 REST 조회)"""
+    if stream is not None:
+        tick = stream.latest(CODE, max_age=STREAM_MAX_AGE)
+        if tick is not None:
+            return tick.price
+    return api.fetch_current_price(CODE)
 
 def load_initial_data():
     """프로그램 시작시 기존 데이터 로드"""
@@ -129,14 +117,27 @@ def update_account_status():
         return 0, 0
 
 def cleanup_orders():
-    """미체결 주문 정리"""
+    """미체결 주문 정리 (조회/취소에 실패하면 남은 주문을 기록하고 정리 결과 반환)"""
     try:
-        api.clear_orders(ACCOUNT, CODE)
-        db.log_info("미체결 주문 정리 완료")
-        print("🔄 미체결 주문 정리 완료")
+        result = api.clear_orders(ACCOUNT, CODE)
     except Exception as e:
         db.log_error(f"미체결 주문 정리 실패: {e}")
         print(f"❌ 미체결 주문 정리 실패: {e}")
+        return None
+    
+    if result["error"]:
+        # 조회 자체가 실패하면 남은 주문을 알 수 없음
+        db.log_error(f"미체결 주문 조회 실패: {result['error']}")
+        print(f"❌ 미체결 주문 조회 실패: {result['error']}")
+    elif result["failed"]:
+        remaining = ", ".join(result["failed"])
+        db.log_error(f"미체결 주문 취소 실패 {len(result['failed'])}건 (남은 주문: {remaining}), "
+                     f"취소 {len(result['cancelled'])}건")
+        print(f"❌ 미체결 주문 취소 실패 {len(result['failed'])}건 (남은 주문: {remaining})")
+    else:
+        db.log_info(f"미체결 주문 정리 완료 (취소 {len(result['cancelled'])}건)")
+        print(f"🔄 미체결 주문 정리 완료 (취소 {len(result['cancelled'])}건)")
+    return result
 
 def main_trading_loop():
     """메인 자동매매 루프"""
@@ -158,6 +159,22 @@ def main_trading_loop():
     print(f"💰 최대 매수금액: {settings['max_buy_amount']:,}원")
     print("=" * 50)
     
+    # 토큰을 환경변수로 받지 않았으면 만료 전에 미리 갱신 (다른 프로세스와 디스크 캐시로 공유)
+    if not ACCESS_TOKEN:
+        token_manager.manager.start_refresher()
+    
+    # 첫 주문에서 TCP/TLS 핸드셰이크가 생기지 않도록 API 연결 미리 맺기
+    api.prewarm()
+    
+    global stream
+    if USE_STREAM and stream is None:
+        import market_stream
+        stream = market_stream.MarketStream([CODE]).start()
+        print("📡 실시간 체결가 스트림 사용")
+    
+    # MA20/MA60 골든/데드크로스 전략 (기존 가격 데이터로 이동평균과 직전 값 초기화)
+    ma_strategy = strategy.FloorMACrossStrategy(20, 60, prices)
+    
     cycle_count = 0
     
     try:
@@ -168,19 +185,16 @@ def main_trading_loop():
             
             try:
                 # 현재 가격 조회
-                current_price = api.fetch_current_price(CODE)
+                current_price = fetch_price()
                 if current_price is None:
                     db.log_error("가격 조회 실패")
                     print("❌ 가격 조회 실패")
                     sleep(60)
                     continue
                 
-                # 가격 리스트에 추가
-                prices.append(current_price)
-                
-                # 이동평균 계산
-                ma20 = calculate_ma(prices, 20)
-                ma60 = calculate_ma(prices, 60)
+                # 이동평균 갱신 및 매매 신호 판단 (직전 봉 이동평균과 비교)
+                signal = ma_strategy.on_bar(current_price) or "HOLD"
+                ma20, ma60 = ma_strategy.ma_short, ma_strategy.ma_long
                 
                 # 이동평균이 계산 가능한 경우에만 진행
                 if ma20 is None or ma60 is None:
@@ -189,24 +203,6 @@ def main_trading_loop():
                     sleep(60)
                     continue
                 
-                # 매매 신호 판단
-                # 최근 이동평균 데이터 가져오기
-                recent_ma_data = db.get_latest_moving_averages(CODE, 2)
-                
-                # 신호 계산을 위한 MA 리스트 구성
-                ma20_list = []
-                ma60_list = []
-                
-                for data in recent_ma_data:
-                    ma20_list.append(data['ma20'])
-                    ma60_list.append(data['ma60'])
-                
-                # 현재 값 추가
-                ma20_list.append(ma20)
-                ma60_list.append(ma60)
-                
-                signal = get_ma_signal(ma20_list, ma60_list)
-                
                 print(f"📈 가격: {current_price:,}원")
                 print(f"📊 MA20: {ma20:,}원, MA60: {ma60:,}원")
                 print(f"🎯 신호: {signal}")
@@ -243,10 +239,6 @@ def main_trading_loop():
                 # 계좌 상태 업데이트 (매 사이클마다)
                 holding_qty, total_eval = update_account_status()
                 
-                # 가격 히스토리 관리 (메모리 효율성을 위해 최근 100개만 유지)
-                if len(prices) > 100:
-                    prices = prices[-100:]
-                
                 print(f"💤 1분 대기...")
                 
             except Exception as e:
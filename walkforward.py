@@ -0,0 +1,154 @@
+# walkforward.py
+"""
+이동평균 크로스 윈도우 워크포워드 검증
+
+  python walkforward.py sample.json --train 120 --test 60
+  python walkforward.py minute.json --train 20000 --test 5000 --short 5:40:5 --long 20:120:10
+
+학습 구간에서 수익률이 가장 좋은 (단기, 장기) 조합을 고르고 바로 다음 검증 구간에서 평가합니다.
+이동평균은 윈도우 크기마다 전체 시계열에 대해 한 번만 계산해 공유 메모리에 올리고,
+각 구간은 그 배열을 잘라서 사용합니다 (구간 시작 전 가격도 이동평균 계산에 포함).
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import backtest
+import indicator
+import sweep
+
+INITIAL_BALANCE = 1000 * 10000
+
+
+def make_folds(length, train_size, test_size, step=None):
+    """(학습 시작, 학습 끝 = 검증 시작, 검증 끝) 목록"""
+    step = step or test_size
+    if step <= 0:
+        raise ValueError(f"구간 이동 간격은 1 이상이어야 합니다: {step}")
+    folds = []
+    start = 0
+    while start + train_size + test_size <= length:
+        folds.append((start, start + train_size, start + train_size + test_size))
+        start += step
+    return folds
+
+
+def build_ma_cache(prices, windows):
+    """윈도우 크기별 이동평균을 한 번씩 계산해 (윈도우 -> 행 번호, 2차원 배열)로 반환"""
+    prefix = indicator.prefix_sum(prices)
+    windows = sorted(set(windows))
+    cache = np.empty((len(windows), len(prices)))
+    for row, window in enumerate(windows):
+        cache[row] = indicator.ma_array(prices, window, prefix)
+    return {window: row for row, window in enumerate(windows)}, cache
+
+
+def roi_between(prices, ma_cache, rows, short, long, start, end, initial_balance=INITIAL_BALANCE):
+    """캐시된 이동평균을 잘라서 [start, end) 구간 백테스트 후 최종 수익률 반환"""
+    result = backtest.simulate_crossover(
+        prices[start:end],
+        ma_cache[rows[short], start:end],
+        ma_cache[rows[long], start:end],
+        initial_balance,
+    )
+    interests = result["interests"]
+    return float(interests[-1]) if len(interests) else 0.0
+
+
+def evaluate_fold(fold, prices, ma_cache, rows, pairs):
+    """학습 구간 최적 조합 선택 후 검증 구간 평가"""
+    train_start, test_start, test_end = fold
+    best = None
+    for short, long in pairs:
+        roi = roi_between(prices, ma_cache, rows, short, long, train_start, test_start)
+        if best is None or roi > best[0]:
+            best = (roi, short, long)
+    train_roi, short, long = best
+    test_roi = roi_between(prices, ma_cache, rows, short, long, test_start, test_end)
+    return {
+        "train": (train_start, test_start),
+        "test": (test_start, test_end),
+        "short": short,
+        "long": long,
+        "train_roi": train_roi,
+        "test_roi": test_roi,
+    }
+
+
+def _init_worker(prices_descriptor, cache_descriptor, rows, pairs):
+    global _context
+    _context = (sweep.attach(prices_descriptor), sweep.attach(cache_descriptor), rows, pairs)
+
+
+def _evaluate_in_pool(fold):
+    prices, ma_cache, rows, pairs = _context
+    return evaluate_fold(fold, prices, ma_cache, rows, pairs)
+
+
+def walk_forward(prices, short_windows, long_windows, train_size, test_size, step=None, processes=None):
+    """모든 구간을 프로세스 풀에서 병렬로 평가"""
+    prices = np.asarray(prices)
+    pairs = [(short, long) for short in short_windows for long in long_windows if long > short]
+    folds = make_folds(len(prices), train_size, test_size, step)
+    if not pairs or not folds:
+        return []
+
+    rows, ma_cache = build_ma_cache(prices, [w for pair in pairs for w in pair])
+    shared_prices = sweep.SharedArray(prices)
+    shared_cache = sweep.SharedArray(ma_cache)
+    del ma_cache
+    try:
+        with ProcessPoolExecutor(max_workers=min(processes or os.cpu_count(), len(folds)),
+                                 initializer=_init_worker,
+                                 initargs=(shared_prices.descriptor, shared_cache.descriptor, rows, pairs)) as pool:
+            return list(pool.map(_evaluate_in_pool, folds))
+    finally:
+        shared_prices.close()
+        shared_cache.close()
+
+
+def print_report(results):
+    print(f"{'구간':>4} {'학습':>15} {'검증':>15} {'단기':>5} {'장기':>5} {'학습(%)':>9} {'검증(%)':>9}")
+    for no, row in enumerate(results, 1):
+        train = f"{row['train'][0]}-{row['train'][1]}"
+        test = f"{row['test'][0]}-{row['test'][1]}"
+        print(f"{no:>4} {train:>15} {test:>15} {row['short']:>5} {row['long']:>5} "
+              f"{row['train_roi']:>9.2f} {row['test_roi']:>9.2f}")
+    if results:
+        compounded = np.prod([1 + row["test_roi"] / 100 for row in results]) - 1
+        average = np.mean([row["test_roi"] for row in results])
+        print(f"📈 검증 구간 누적 수익률: {compounded * 100:.2f}% (평균 {average:.2f}%)")
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"1 이상이어야 합니다: {text}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="이동평균 크로스 워크포워드 검증")
+    parser.add_argument("file", help="분봉 JSON 파일")
+    parser.add_argument("--train", type=positive_int, required=True, help="학습 구간 길이 (분봉 수)")
+    parser.add_argument("--test", type=positive_int, required=True, help="검증 구간 길이 (분봉 수)")
+    parser.add_argument("--step", type=positive_int, default=None, help="구간 이동 간격 (기본: 검증 구간 길이)")
+    parser.add_argument("--short", default="5:40:5", help="단기 윈도우 (예: 5:40:5 또는 5,10,20)")
+    parser.add_argument("--long", default="20:120:10", help="장기 윈도우")
+    parser.add_argument("--processes", type=int, default=None, help="프로세스 수 (기본: 코어 수)")
+    args = parser.parse_args()
+
+    prices = np.asarray(backtest.load_prices(args.file), dtype=np.int64)
+    results = walk_forward(prices, sweep.parse_windows(args.short), sweep.parse_windows(args.long),
+                           args.train, args.test, args.step, args.processes)
+    if not results:
+        print("❌ 데이터가 학습 + 검증 구간보다 짧습니다")
+        return
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()